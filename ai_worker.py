@@ -0,0 +1,220 @@
+import os
+import queue
+import threading
+import multiprocessing as mp
+from multiprocessing import shared_memory
+import numpy as np
+from PIL import Image
+import config
+
+
+# === 独立进程的 AI 放大 ===
+# 推理放到子进程里跑：numpy/onnxruntime 不再和 Tk 抢 GIL，原生库崩溃也只会带走子进程。
+# 图像通过 shared_memory 传递 (父进程分配输入/输出两块，子进程原地读写)，管道里只走几个小消息。
+# UpscalerPool 对外接口和 AIUpscaler 一样：is_ready / warmup() / process(img)
+
+
+def _attach(name):
+    try:
+        return shared_memory.SharedMemory(name=name, track=False)
+    except TypeError:   # Python < 3.13 没有 track 参数
+        return shared_memory.SharedMemory(name=name)
+
+
+# 子进程入口：加载模型、预热，然后循环处理父进程发来的请求
+# intra_threads: 多个子进程时平分 CPU 核心，避免每个进程都按满核开线程互相抢
+def _worker_main(conn, model_path, intra_threads):
+    from upscaler import AIUpscaler, load_ort_settings
+    settings = load_ort_settings()
+    if settings["intra_threads"] == 0: settings["intra_threads"] = intra_threads
+    up = AIUpscaler(model_path, settings=settings)
+    ready = up.is_ready and up.warmup()
+    conn.send(("ready", ready, up.scale))
+    while True:
+        try:
+            msg = conn.recv()
+        except EOFError:
+            return
+        if msg[0] == "quit": return
+        if msg[0] == "ping":
+            conn.send(("pong",))
+            continue
+        _, in_name, out_name, (h, w), tile, overlap = msg
+        shm_in = _attach(in_name); shm_out = _attach(out_name)
+        try:
+            src = np.ndarray((h, w, 3), np.uint8, buffer=shm_in.buf)
+            res = np.asarray(up.process(Image.fromarray(src), tile, overlap))
+            dst = np.ndarray((h * up.scale, w * up.scale, 3), np.uint8, buffer=shm_out.buf)
+            # 形状不对说明 process 失败后原样返回了输入，错误信息子进程已经打印
+            if res.shape == dst.shape:
+                np.copyto(dst, res)
+                conn.send(("ok",))
+            else:
+                conn.send(("failed",))
+            del src, dst, res
+        except Exception as e:
+            conn.send(("error", str(e)))
+        finally:
+            shm_in.close(); shm_out.close()
+
+
+class WorkerDied(Exception):
+    pass
+
+
+# 一个子进程 + 一条管道。lock 保证同一时刻只有一个请求 (或健康检查) 在用这条管道
+class _Worker:
+    def __init__(self, ctx, index, model_path, intra_threads):
+        self.ctx = ctx
+        self.index = index
+        self.model_path = model_path
+        self.intra_threads = intra_threads
+        self.lock = threading.Lock()
+        self.proc = None
+        self.conn = None
+        self.ready = False
+        self.scale = None
+        self.restarts = 0
+
+    def start(self):
+        parent, child = self.ctx.Pipe()
+        self.conn = parent
+        self.proc = self.ctx.Process(target=_worker_main, args=(child, self.model_path, self.intra_threads),
+                                     name=f"ai-worker-{self.index}", daemon=True)
+        self.proc.start()
+        child.close()
+
+    # 等子进程加载完模型
+    def wait_ready(self, timeout):
+        self.ready = False
+        try:
+            if self.conn.poll(timeout):
+                _, self.ready, self.scale = self.conn.recv()
+        except (EOFError, OSError):
+            pass
+        if not self.ready: print(f"[Error] AI worker {self.index} failed to start")
+        return self.ready
+
+    def stop(self):
+        if self.proc is None: return
+        try: self.conn.send(("quit",))
+        except (OSError, ValueError): pass
+        self.proc.join(2)
+        if self.proc.is_alive(): self.proc.kill()
+        self.conn.close()
+        self.proc = None
+
+    def restart(self, timeout):
+        self.stop()
+        self.restarts += 1
+        self.start()
+        return self.wait_ready(timeout)
+
+    def _call(self, msg, timeout):
+        try:
+            self.conn.send(msg)
+            if not self.conn.poll(timeout): raise WorkerDied("timeout")
+            return self.conn.recv()
+        except (EOFError, OSError) as e:
+            raise WorkerDied(e)
+
+    def ping(self, timeout):
+        if self.proc is None or not self.proc.is_alive(): return False
+        try: return self._call(("ping",), timeout)[0] == "pong"
+        except WorkerDied: return False
+
+    def run(self, img, tile, overlap, timeout):
+        w, h = img.size
+        s = self.scale
+        shm_in = shared_memory.SharedMemory(create=True, size=h * w * 3)
+        shm_out = shared_memory.SharedMemory(create=True, size=h * s * w * s * 3)
+        try:
+            src = np.ndarray((h, w, 3), np.uint8, buffer=shm_in.buf)
+            np.copyto(src, np.asarray(img))
+            del src
+            reply = self._call(("process", shm_in.name, shm_out.name, (h, w), tile, overlap), timeout)
+            if reply[0] == "error": raise RuntimeError(reply[1])
+            if reply[0] != "ok": return None
+            dst = np.ndarray((h * s, w * s, 3), np.uint8, buffer=shm_out.buf)
+            out = Image.fromarray(dst)   # RGB 会复制一份，之后可以释放共享内存
+            del dst
+            return out
+        finally:
+            shm_in.close(); shm_in.unlink()
+            shm_out.close(); shm_out.unlink()
+
+
+# === 子进程池 ===
+# 每个请求取一个空闲子进程；子进程死掉/超时就重启后重试一次。
+# 后台线程定期 ping 空闲的子进程，挂掉的提前重启，不用等下一次保存才发现
+class UpscalerPool:
+    def __init__(self, model_path="4x-UltraSharp.onnx", workers=1):
+        self.timeout = config.AI_WORKER_TIMEOUT
+        ctx = mp.get_context("spawn")   # 不 fork 带着 Tk 和线程的主进程
+        workers = max(1, workers)
+        threads = max(1, (os.cpu_count() or 1) // workers) if workers > 1 else 0
+        self.workers = [_Worker(ctx, i, model_path, threads) for i in range(workers)]
+        for w in self.workers: w.start()
+        for w in self.workers: w.wait_ready(self.timeout)
+        self._idle = queue.Queue()
+        for w in self.workers: self._idle.put(w)
+        self._closed = threading.Event()
+        threading.Thread(target=self._health_loop, daemon=True).start()
+
+    @property
+    def is_ready(self):
+        return any(w.ready for w in self.workers)
+
+    @property
+    def scale(self):
+        return next((w.scale for w in self.workers if w.ready), None)
+
+    # 子进程启动时已经各自预热过
+    def warmup(self):
+        return self.is_ready
+
+    # cancel 只在交给子进程之前检查 (子进程里的推理中途停不下来)
+    def process(self, pil_image, tile=None, overlap=None, cancel=None):
+        if not self.is_ready: return pil_image
+        if cancel is not None and cancel.is_set(): return None
+        if pil_image.mode != 'RGB': pil_image = pil_image.convert('RGB')
+        worker = self._idle.get()
+        try:
+            with worker.lock:
+                for attempt in range(2):
+                    if not worker.ready and not worker.restart(self.timeout): break
+                    try:
+                        out = worker.run(pil_image, tile, overlap, self.timeout)
+                        return pil_image if out is None else out
+                    except WorkerDied as e:
+                        print(f"[Warn] AI worker {worker.index} died ({e}), restarting")
+                        worker.ready = False
+                    except Exception as e:
+                        print(f"[Error] AI Processing failed: {e}")
+                        return pil_image
+            print(f"[Error] AI Processing failed: worker {worker.index} unavailable")
+            return pil_image
+        finally:
+            self._idle.put(worker)
+
+    def _health_loop(self):
+        while not self._closed.wait(config.AI_WORKER_HEALTH_SEC):
+            for w in self.workers:
+                # 正在干活说明还活着；没启动成功的留给下次请求时重启
+                if not w.ready or not w.lock.acquire(blocking=False): continue
+                try:
+                    if self._closed.is_set(): return
+                    if not w.ping(5):
+                        print(f"[Warn] AI worker {w.index} not responding, restarting")
+                        w.restart(self.timeout)
+                finally:
+                    w.lock.release()
+
+    def stats(self):
+        return {"workers": len(self.workers), "ready": sum(w.ready for w in self.workers),
+                "restarts": sum(w.restarts for w in self.workers)}
+
+    def close(self):
+        self._closed.set()
+        for w in self.workers:
+            with w.lock: w.stop()
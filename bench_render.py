@@ -0,0 +1,50 @@
+import time
+import tkinter as tk
+from PIL import Image, ImageTk
+from render_cache import PhotoBuffer
+
+# 画布主图每帧上屏耗时对比：每帧新建 PhotoImage + 图元 vs 复用 PhotoBuffer
+# 用法: python bench_render.py  (需要图形界面；服务器上用 xvfb-run -a python bench_render.py)
+SIZES = {"1080p": (1920, 1080), "4K": (3840, 2160)}
+FRAMES = 30
+
+
+def bench_new(canvas, frames):
+    t = time.perf_counter()
+    for im in frames:
+        photo = ImageTk.PhotoImage(im)
+        canvas.delete("img")
+        canvas.create_image(0, 0, image=photo, anchor=tk.NW, tags="img")
+        canvas.update_idletasks()
+    return (time.perf_counter() - t) / len(frames)
+
+
+def bench_buffer(canvas, frames):
+    buf = PhotoBuffer()
+    canvas.delete("img")
+    t = time.perf_counter()
+    for im in frames:
+        if buf.show(im):
+            canvas.delete("img")
+            canvas.create_image(0, 0, image=buf.photo, anchor=tk.NW, tags="img")
+        canvas.update_idletasks()
+    return (time.perf_counter() - t) / len(frames)
+
+
+if __name__ == "__main__":
+    try:
+        root = tk.Tk()
+    except tk.TclError as e:
+        raise SystemExit(f"[Error] No display ({e}), run under xvfb-run -a python bench_render.py")
+    print(f"[Bench] Tk {tk.TkVersion}, {root.winfo_screenwidth()}x{root.winfo_screenheight()} screen, {FRAMES} frames per size")
+    for name, size in SIZES.items():
+        # 画布和帧一样大，整帧都在可见区域里 (和主界面铺满画布的情况一致)
+        canvas = tk.Canvas(root, width=size[0], height=size[1], highlightthickness=0)
+        canvas.pack()
+        root.update()
+        frames = [Image.effect_noise(size, 20 + i).convert('RGB') for i in range(4)] * (FRAMES // 4)
+        a = bench_new(canvas, frames)
+        b = bench_buffer(canvas, frames)
+        print(f"{name:6s} new PhotoImage: {a*1000:7.1f} ms/frame | reused buffer: {b*1000:7.1f} ms/frame")
+        canvas.destroy()
+    root.destroy()
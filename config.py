@@ -24,4 +24,85 @@ BG_COLOR = "#1E1E1E"
 PANEL_COLOR = "#252526"
 CANVAS_COLOR = "#0F0F0F"
 COLOR_TEXT_MAIN = "#FFFFFF"
-COLOR_TEXT_SUB = "#888888"
\ No newline at end of file
+COLOR_TEXT_SUB = "#888888"
+
+# ================= 性能参数 =================
+# 预读取：提前在后台解码后面 N 张 / 前面 M 张
+PREFETCH_AHEAD = 3
+PREFETCH_BEHIND = 1
+PREFETCH_WORKERS = 2
+PREFETCH_CACHE_MB = 768   # 解码缓存上限 (按像素字节数计)
+PROXY_DECODE = True       # 编辑时只解码够显示用的低分辨率代理图，原图在后台解码供保存
+PYRAMID_MIN_SIDE = 256    # 金字塔最粗一级的短边下限
+TILE_SIZE = 256           # 视口瓦片边长 (屏幕像素)
+TILE_CACHE_MB = 128       # 瓦片缓存上限
+DRAG_OVERSCAN = 256       # 视口四周额外渲染的像素，拖拽在这个范围内只平移不重绘
+RESIZE_DEBOUNCE_MS = 80   # 窗口缩放停止多久后重建遮罩
+TARGET_FPS = 60           # 拖拽/缩放时的渲染帧率上限，多余的事件合并到下一帧
+WHEEL_SETTLE_MS = 200     # 滚轮停止多久后渲染高画质
+SHOW_RENDER_STATS = False # 每次交互结束后打印帧率 / 丢弃事件数
+PROGRESSIVE_REFINE = True                 # 停下后先显示快速预览，后台渐进提升画质
+REFINE_FILTERS = ("BILINEAR", "LANCZOS")  # 后台依次计算的画质等级
+
+# 后台保存队列
+SAVE_WORKERS = 2          # 并行处理的保存任务数 (AI 放大很吃内存，机器差的话改成 1)
+SAVE_MAX_PENDING = 8      # 排队上限 (背压)
+SAVE_FULL_POLICY = "block"  # 队列满时: "block" 等待空位 / "reject" 拒绝并提示
+SAVE_ORDERED = True       # 按提交顺序写盘
+
+# AI 放大分块推理
+AI_TILE_SIZE = 256        # 分块边长 (输入像素)，0 = 整张一次推理
+AI_TILE_OVERLAP = 16      # 相邻块重叠像素，重叠区做羽化融合消除接缝
+AI_TILE_MIN = 64          # 推理失败时块会减半重试，最小到这个尺寸
+# 分块结果与整图推理的容差 (0-255 灰阶)，check-tiles 命令按此判断
+AI_TILE_TOLERANCE_MEAN = 0.5
+AI_TILE_TOLERANCE_MAX = 8
+AI_MIN_FACTOR = 1.2       # 需要的放大倍数低于此值时不走 AI，直接 LANCZOS
+AI_SEC_PER_MPIX = 60.0    # 估算耗时用：模型每百万输入像素大约多少秒 (按本机实测调整)
+AI_WARMUP = True          # 启动后在后台加载模型并预热，首张 AI 保存不用等
+
+# onnxruntime 会话参数 (0 = 让 onnxruntime 自己决定)
+# python upscaler.py autotune 会在本机实测并把最快的组合写进 AI_ORT_SETTINGS，启动时覆盖下面的默认值
+AI_ORT_INTRA_THREADS = 0  # 单个算子内部的并行线程数
+AI_ORT_INTER_THREADS = 0  # 算子之间的并行线程数 (只在 parallel 模式下有用)
+AI_ORT_OPT_LEVEL = "all"  # 图优化等级: disable / basic / extended / all
+AI_ORT_MEM_ARENA = True   # CPU 内存池，关掉省内存但每次推理都要重新分配
+AI_ORT_EXEC_MODE = "sequential"  # sequential / parallel
+AI_ORT_CACHE_OPTIMIZED = True    # 把优化后的模型存盘，下次启动直接加载不再重新优化
+AI_ORT_SETTINGS = os.path.join(BASE_DIR, 'ort_settings.json')
+AI_BUFFER_CACHE_MB = 64   # 每个线程常驻的推理输入/输出缓冲上限，更大的缓冲用完即弃
+# AI 放大放到独立进程：0 = 在主进程里推理；>= 1 为子进程数 (多核机器上多张图可以同时放大)
+AI_WORKER_PROCESSES = 0
+AI_WORKER_TIMEOUT = 600   # 单次请求 (含子进程加载模型) 最长等待秒数，超时视为子进程卡死并重启
+AI_WORKER_HEALTH_SEC = 10 # 空闲子进程健康检查间隔 (秒)
+# 分块推理动态批处理：多个块拼成一批推理 (GPU 上收益明显)。1 = 关闭；模型 batch 维固定时自动关闭
+AI_BATCH_MAX = 4
+AI_BATCH_ON_CPU = False   # CPU 推理时批处理通常没有收益，用 python upscaler.py bench-batch 实测后再打开
+AI_BATCH_WINDOW_MS = 5    # 凑批最多等待的毫秒数 (单块额外延迟上限)
+# 多模型：models 目录下的 *.onnx 都会登记，按需要的放大倍数自动挑最省时的 (详见 model_registry.py)
+AI_MODELS_DIR = os.path.join(BASE_DIR, 'models')
+AI_LEGACY_MODEL = "4x-UltraSharp.onnx"   # 旧版放在程序目录的模型，继续可用
+AI_MODEL_MEMORY_MB = 1024 # 同时加载的模型估算内存上限，超出后卸载最久没用的
+AI_PRECISION = "fp32"     # fp32 / fp16 / int8，模型目录里没有对应版本时自动用 fp32 (用 quantize.py 生成)
+# 预测性放大：开启 AI 且需要放大时，裁剪框停住这么久就在后台先算，按保存时参数没变直接用
+AI_SPECULATE = True
+AI_SPECULATE_DELAY_MS = 800
+
+# 缩略图磁盘缓存 (回收站网格、详情面板、右侧结果预览共用)
+THUMB_CACHE_DB = os.path.join(BASE_DIR, 'thumb_cache.sqlite')
+THUMB_CACHE_MB = 200      # 缓存文件大小上限，超出后淘汰最久没看过的缩略图
+THUMB_WORKERS = 2         # 后台生成缩略图的线程数
+THUMB_PRELOAD = True      # 打开回收站后在后台把所有图片的缩略图都生成好，滚动时直接命中
+THUMB_PREVIEW_BOX = 512   # 右侧结果预览用的缩略图边长
+LIGHTBOX_PREFETCH = 2     # 回收站大图预览：前后各预先解码几张
+LIGHTBOX_CACHE_MB = 64    # 预览缓存上限 (缩到窗口大小后的像素字节数)
+
+# 回收站批量恢复/删除
+FILEOPS_WORKERS = 4       # 并行移动/删除文件的线程数 (机械硬盘上改成 1-2)
+FILEOPS_JOURNAL_DIR = os.path.join(BASE_DIR, 'fileops_journal')  # 批量操作日志，中断后据此继续或撤销
+
+# 输入目录监视：新增/删除的图片自动并入列表，不用再手动刷新
+WATCH_DIRS = True
+WATCH_BACKEND = "auto"    # auto (Linux 用 inotify，其他平台轮询) / inotify / poll
+WATCH_POLL_SEC = 1.0      # 轮询模式下检查目录的间隔 (秒)
+WATCH_DEBOUNCE_MS = 200   # 一批变化安静多久后再通知界面
@@ -0,0 +1,326 @@
+import os
+import errno
+import json
+import time
+import shutil
+import threading
+import itertools
+from concurrent.futures import ThreadPoolExecutor
+import config
+
+
+# === 批量文件操作 (回收站恢复 / 删除 / 清空) ===
+# 一批操作先整体写进日志文件 (每个文件要做的几次移动)，然后在线程池里并行执行，每完成一步追加一行日志。
+# 程序中途退出/崩溃后日志还在：resume() 把剩下的做完，rollback() 把已经做的撤回去。
+# 永久删除也拆成两段：先把文件移进同目录下的暂存文件夹 (同盘 rename，可撤销)，全部移完写 commit，
+# 再清空暂存文件夹。commit 之后的删除不能再撤销，rollback 会改为继续清理。
+# 日志格式 (JSON lines)：
+#   第一行 {"id", "kind", "created", "items": [{"name", "steps": [[src, dst], ...]}, ...], "staging": [...]}
+#   {"item": i, "step": k}    第 i 个文件完成了前 k 步
+#   {"failed": i, "error": e} 第 i 个文件出错 (之前完成的步骤保留)
+#   {"commit": true}          所有移动都结束了
+# 整批结束 (或撤销完) 后日志文件删除。
+# 每一步的记录只是攒着批量写：崩溃时没写进去的步骤，resume/rollback 按文件实际在哪边判断，
+# 真正要落盘的只有第一行 (要做什么) 和 commit
+STAGING_PREFIX = ".deleting-"
+CHUNK = 32              # 每个线程池任务处理的文件数，文件很小时单个任务的调度开销比移动本身还大
+FLUSH_EVERY = 256       # 攒多少行日志写一次
+_ids = itertools.count(1)
+
+
+class Batch:
+    def __init__(self, journal_path, header):
+        self.path = journal_path
+        self.id = header["id"]
+        self.kind = header["kind"]
+        self.items = header["items"]
+        self.staging = header.get("staging", [])
+        self.progress = {}      # 文件下标 -> 已完成步数
+        self.errors = {}        # 文件下标 -> 错误信息
+        self.error = None       # 整批中止的原因 (建目录/写日志/清理失败)，日志保留，下次启动再处理
+        self.committed = False
+        self._lock = threading.Lock()
+        self._file = None
+        self._buffer = []
+
+    @property
+    def total(self):
+        return len(self.items)
+
+    def log(self, record, sync=False):
+        with self._lock:
+            self._buffer.append(json.dumps(record, ensure_ascii=False) + "\n")
+            if sync or len(self._buffer) >= FLUSH_EVERY: self._flush(sync)
+
+    def _flush(self, sync=False):
+        if self._file is None: self._file = open(self.path, "a", encoding="utf-8")
+        self._file.writelines(self._buffer)
+        self._buffer = []
+        self._file.flush()
+        if sync: os.fsync(self._file.fileno())
+
+    def close(self):
+        with self._lock:
+            if self._buffer: self._flush()
+            if self._file: self._file.close(); self._file = None
+
+    # 至少第一步 (回收站里的那个文件) 完成了的文件
+    def succeeded(self):
+        return [it["name"] for i, it in enumerate(self.items) if self.progress.get(i, 0) > 0]
+
+    def failures(self):
+        return {self.items[i]["name"]: e for i, e in self.errors.items()}
+
+
+def _new_id():
+    return f"{time.strftime('%Y%m%d-%H%M%S')}-{os.getpid()}-{next(_ids)}"
+
+
+def _create(journal_dir, batch_id, kind, items, staging=()):
+    os.makedirs(journal_dir, exist_ok=True)
+    for d in staging: os.makedirs(d, exist_ok=True)
+    header = {"id": batch_id, "kind": kind, "created": time.time(), "items": items, "staging": list(staging)}
+    batch = Batch(os.path.join(journal_dir, f"{batch_id}.journal"), header)
+    batch.log(header, sync=True)
+    return batch
+
+
+def load_batch(journal_path):
+    with open(journal_path, encoding="utf-8") as f:
+        lines = [l for l in f.read().splitlines() if l.strip()]
+    batch = Batch(journal_path, json.loads(lines[0]))
+    for line in lines[1:]:
+        try: rec = json.loads(line)
+        except ValueError: break      # 崩溃时写了一半的最后一行
+        if "item" in rec: batch.progress[rec["item"]] = max(batch.progress.get(rec["item"], 0), rec["step"])
+        elif "failed" in rec: batch.errors[rec["failed"]] = rec["error"]
+        elif rec.get("commit"): batch.committed = True
+    return batch
+
+
+def _move(src, dst):
+    if os.path.exists(dst):
+        # 中断前已经移过去了，只是日志没来得及写
+        if not os.path.exists(src): return
+        raise FileExistsError(f"目标已存在: {dst}")
+    try:
+        os.rename(src, dst)     # 同一个盘：只改目录项
+    except OSError as e:
+        if e.errno != errno.EXDEV: raise
+        shutil.move(src, dst)   # 跨盘：复制后删除
+
+
+class FileOps:
+    def __init__(self, journal_dir, workers=4):
+        self.journal_dir = journal_dir
+        self.workers = max(1, workers)
+
+    # === 生成一批操作 ===
+    # 恢复：回收站原图 -> 源目录，对应的结果图 (若有) 从结果回收站 -> 结果目录
+    def restore(self, names, trash_dir, input_dir, save_trash_dir, save_dir):
+        items = []
+        for name in names:
+            steps = [[os.path.join(trash_dir, name), os.path.join(input_dir, name)]]
+            s_name = os.path.splitext(name)[0] + ".jpg"
+            if os.path.exists(os.path.join(save_trash_dir, s_name)):
+                steps.append([os.path.join(save_trash_dir, s_name), os.path.join(save_dir, s_name)])
+            items.append({"name": name, "steps": steps})
+        return _create(self.journal_dir, _new_id(), "restore", items)
+
+    # 永久删除：先移进各自目录下的暂存文件夹，commit 后再清空
+    def delete(self, names, trash_dir, save_trash_dir):
+        batch_id = _new_id()
+        stage_trash = os.path.join(trash_dir, STAGING_PREFIX + batch_id)
+        stage_save = os.path.join(save_trash_dir, STAGING_PREFIX + batch_id)
+        items = []
+        for name in names:
+            steps = [[os.path.join(trash_dir, name), os.path.join(stage_trash, name)]]
+            s_name = os.path.splitext(name)[0] + ".jpg"
+            if os.path.exists(os.path.join(save_trash_dir, s_name)):
+                steps.append([os.path.join(save_trash_dir, s_name), os.path.join(stage_save, s_name)])
+            items.append({"name": name, "steps": steps})
+        return _create(self.journal_dir, batch_id, "delete", items, [stage_trash, stage_save])
+
+    # === 执行 ===
+    # 在后台线程里跑完整批 (resume 同样走这里，已完成的步骤跳过)。
+    # on_progress(done, total) 最多每 50ms 调一次，on_done(batch) 结束时一定调一次 (中途出错也一样，
+    # 原因在 batch.error)，都在工作线程里
+    def run(self, batch, on_progress=None, on_done=None):
+        t = threading.Thread(target=self.run_sync, args=(batch, on_progress, on_done), name="file-ops", daemon=True)
+        t.start()
+        return t
+
+    def run_sync(self, batch, on_progress=None, on_done=None):
+        try:
+            self._execute(batch, on_progress)
+        except Exception as e:
+            batch.error = str(e)
+            print(f"[Error] {batch.kind} batch {batch.id} stopped: {e}")
+            try: batch.close()
+            except Exception: pass
+        finally:
+            if on_done: on_done(batch)
+        return batch
+
+    def _execute(self, batch, on_progress):
+        for d in batch.staging: os.makedirs(d, exist_ok=True)
+        todo = [i for i in range(batch.total) if batch.progress.get(i, 0) < len(batch.items[i]["steps"])]
+        done = batch.total - len(todo)
+        last = 0.0
+        if not batch.committed:
+            chunks = [todo[i:i + CHUNK] for i in range(0, len(todo), CHUNK)]
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="file-ops") as pool:
+                for n in pool.map(lambda chunk: self._run_chunk(batch, chunk), chunks):
+                    done += n
+                    now = time.perf_counter()
+                    if on_progress and now - last > 0.05:
+                        last = now
+                        on_progress(done, batch.total)
+            batch.log({"commit": True}, sync=True)
+            batch.committed = True
+        self._purge(batch)
+        batch.close()
+        os.remove(batch.path)
+        if on_progress: on_progress(batch.total, batch.total)
+
+    def _run_chunk(self, batch, chunk):
+        for i in chunk: self._run_item(batch, i)
+        return len(chunk)
+
+    def _run_item(self, batch, i):
+        item = batch.items[i]
+        for k, (src, dst) in enumerate(item["steps"]):
+            if k < batch.progress.get(i, 0): continue
+            try:
+                _move(src, dst)
+            except Exception as e:
+                batch.errors[i] = str(e)
+                batch.log({"failed": i, "error": str(e)})
+                print(f"[Error] {batch.kind} {item['name']}: {e}")
+                return
+            batch.progress[i] = k + 1
+            batch.log({"item": i, "step": k + 1})
+
+    # 暂存文件夹里的文件并行删除，最后删掉空文件夹
+    def _purge(self, batch):
+        for d in batch.staging:
+            if not os.path.isdir(d): continue
+            paths = [os.path.join(d, f) for f in os.listdir(d)]
+            chunks = [paths[i:i + CHUNK] for i in range(0, len(paths), CHUNK)]
+            with ThreadPoolExecutor(max_workers=self.workers, thread_name_prefix="file-ops") as pool:
+                list(pool.map(_remove_quiet, chunks))
+            shutil.rmtree(d, ignore_errors=True)
+
+    # === 中断恢复 ===
+    def pending(self):
+        if not os.path.isdir(self.journal_dir): return []
+        batches = []
+        for f in sorted(os.listdir(self.journal_dir)):
+            if not f.endswith(".journal"): continue
+            try: batches.append(load_batch(os.path.join(self.journal_dir, f)))
+            except Exception as e: print(f"[Warn] Unreadable file-ops journal {f}: {e}")
+        return batches
+
+    # 把已经做了的步骤反向撤回；已经 commit 的删除无法撤回，改为做完
+    def rollback(self, batch):
+        if batch.committed: return self.run_sync(batch)
+        for i in reversed(range(batch.total)):
+            steps = batch.items[i]["steps"]
+            for src, dst in reversed(steps):
+                # 日志里没记上的步骤也可能已经做了，按文件实际位置判断
+                if os.path.exists(dst) and not os.path.exists(src):
+                    try: shutil.move(dst, src)
+                    except Exception as e: print(f"[Error] rollback {batch.items[i]['name']}: {e}")
+        for d in batch.staging:
+            try: os.rmdir(d)
+            except OSError: pass
+        batch.close()
+        os.remove(batch.path)
+        return batch
+
+
+def _remove_quiet(paths):
+    for path in paths:
+        try: os.remove(path)
+        except OSError as e: print(f"[Error] delete {path}: {e}")
+
+
+_ops = None
+
+
+def get_file_ops():
+    global _ops
+    if _ops is None: _ops = FileOps(config.FILEOPS_JOURNAL_DIR, config.FILEOPS_WORKERS)
+    return _ops
+
+
+# python file_ops.py status | resume | rollback   处理上次中断的批量操作
+# python file_ops.py bench [--files 10000] [--workers 4]   在临时目录里测恢复/删除吞吐，和逐个移动对比
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    parser = argparse.ArgumentParser(description="SmartCropper bulk file operations")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    sub.add_parser("status", help="list interrupted batches")
+    sub.add_parser("resume", help="finish interrupted batches")
+    sub.add_parser("rollback", help="undo interrupted batches")
+    p = sub.add_parser("bench", help="restore/delete throughput on a temporary folder")
+    p.add_argument("--files", type=int, default=10000)
+    p.add_argument("--workers", type=int, default=config.FILEOPS_WORKERS)
+    p.add_argument("--size-kb", type=int, default=64)
+    p.add_argument("--dir", help="where to create the test folders (default: system temp)")
+    args = parser.parse_args()
+
+    ops = get_file_ops()
+    if args.cmd in ("status", "resume", "rollback"):
+        batches = ops.pending()
+        if not batches: print("[Info] No interrupted batches")
+        for b in batches:
+            print(f"[Info] {b.id}: {b.kind}, {len(b.succeeded())}/{b.total} files moved, {len(b.errors)} failed,"
+                  f" {'committed' if b.committed else 'not committed'}")
+            if args.cmd == "resume": ops.run_sync(b)
+            elif args.cmd == "rollback": ops.rollback(b)
+        raise SystemExit
+
+    payload = os.urandom(args.size_kb * 1024)
+    with tempfile.TemporaryDirectory(dir=args.dir) as tmp:
+        dirs = {k: os.path.join(tmp, k) for k in ("trash", "input", "save_trash", "save", "journal")}
+        for d in dirs.values(): os.makedirs(d)
+        names = [f"{i:06d}.jpg" for i in range(args.files)]
+
+        def fill():
+            for n in names:
+                with open(os.path.join(dirs["trash"], n), "wb") as f: f.write(payload)
+                with open(os.path.join(dirs["save_trash"], n), "wb") as f: f.write(payload)
+
+        def timed(label, fn):
+            t = time.perf_counter()
+            fn()
+            dt = time.perf_counter() - t
+            print(f"  {label:<28}{dt:7.2f} s  {args.files / dt:8.0f} files/s")
+
+        def clear_input():
+            for d in ("input", "save"):
+                for f in os.listdir(dirs[d]): os.remove(os.path.join(dirs[d], f))
+
+        # 旧做法：界面线程里逐个 shutil.move / os.remove
+        def old_restore():
+            for n in names:
+                shutil.move(os.path.join(dirs["trash"], n), os.path.join(dirs["input"], n))
+                if os.path.exists(os.path.join(dirs["save_trash"], n)):
+                    shutil.move(os.path.join(dirs["save_trash"], n), os.path.join(dirs["save"], n))
+
+        def old_delete():
+            for n in names:
+                os.remove(os.path.join(dirs["trash"], n))
+                p = os.path.join(dirs["save_trash"], n)
+                if os.path.exists(p): os.remove(p)
+
+        bench_ops = FileOps(dirs["journal"], args.workers)
+        print(f"[Bench] {args.files} files x 2 ({args.size_kb} KB each), {args.workers} workers, {os.cpu_count()} CPUs")
+        fill(); timed("restore, sequential (old)", old_restore); clear_input()
+        fill(); timed("restore, journaled pool", lambda: bench_ops.run_sync(
+            bench_ops.restore(names, dirs["trash"], dirs["input"], dirs["save_trash"], dirs["save"]))); clear_input()
+        fill(); timed("delete, sequential (old)", old_delete)
+        fill(); timed("delete, journaled pool", lambda: bench_ops.run_sync(
+            bench_ops.delete(names, dirs["trash"], dirs["save_trash"])))
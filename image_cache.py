@@ -0,0 +1,227 @@
+import os
+import math
+import threading
+from collections import OrderedDict
+from concurrent.futures import ThreadPoolExecutor
+from PIL import Image
+
+
+# === 解码结果：image 可能是缩小后的代理图，full_size 永远是原图尺寸 ===
+class Decoded:
+    def __init__(self, path, image, full_size):
+        self.path = path
+        self.image = image
+        self.full_size = full_size
+
+    @property
+    def is_full(self):
+        return self.image.size == self.full_size
+
+
+def decode_image(path):
+    img = Image.open(path)
+    return img.convert('RGB')
+
+
+def decode_full(path):
+    img = decode_image(path)
+    return Decoded(path, img, img.size)
+
+
+# === 低分辨率解码：只解出“刚好够用”的代理图 ===
+# 2 的幂次缩小，保证在最小缩放 (min_scale) 下代理图像素 >= 屏幕像素。
+# 旋转 90° 时宽高互换，所以两种方向都要满足。JPEG 走 draft (DCT 域缩放，真正省解码)，
+# 其他格式只能完整解码后 reduce()，省的是内存和后续渲染
+def decode_proxy(path, box_w, box_h, max_reduce=16):
+    img = Image.open(path)
+    full_w, full_h = img.size
+    need = max(box_w / full_w, box_h / full_h, box_w / full_h, box_h / full_w)
+    r = 1
+    while r < max_reduce and need * r * 2 <= 1: r *= 2
+    if r > 1 and img.format == 'JPEG':
+        img.draft('RGB', (math.ceil(full_w / r), math.ceil(full_h / r)))
+    img = img.convert('RGB')
+    k = max(1, round(full_w / img.width))   # draft 已经缩小的倍数
+    if r // k > 1: img = img.reduce(r // k)
+    return Decoded(path, img, (full_w, full_h))
+
+
+# === 缩放到框内显示 (回收站灯箱等)：JPEG 先 draft 到刚好不小于框的尺寸，再 LANCZOS 缩进框里 ===
+def decode_fit(path, box_w, box_h):
+    img = Image.open(path)
+    full_size = img.size
+    if img.format == 'JPEG': img.draft('RGB', (box_w, box_h))
+    img = img.convert('RGB')
+    img.thumbnail((box_w, box_h), Image.Resampling.LANCZOS)
+    return Decoded(path, img, full_size)
+
+
+def image_nbytes(img):
+    if isinstance(img, Decoded): img = img.image
+    return img.width * img.height * len(img.getbands())
+
+
+# === 旋转后坐标系中的裁剪框 -> 原图坐标 ===
+# 先裁再转，结果与 “整图旋转后再裁” 逐像素一致，但不用旋转整张大图
+def crop_rotated(img, rotation, box):
+    W, H = img.size
+    u1, v1, u2, v2 = [int(round(v)) for v in box]
+    if rotation == 90: src = (W - v2, u1, W - v1, u2)
+    elif rotation == 180: src = (W - u2, H - v2, W - u1, H - v1)
+    elif rotation == 270: src = (v1, H - u2, v2, H - u1)
+    else: return img.crop((u1, v1, u2, v2))
+    return img.crop(src).rotate(rotation, expand=True)
+
+
+# === 后台预解码 + 按字节预算的 LRU 缓存 ===
+# 缓存的是未旋转的 RGB 原图，调用方只能读不能改 (crop/rotate/resize 都返回新图)
+class ImagePrefetcher:
+    def __init__(self, ahead=3, behind=1, budget_mb=768, workers=2):
+        self.ahead = ahead
+        self.behind = behind
+        self.budget = int(budget_mb * 1024 * 1024)
+        self.decode = decode_full
+
+        self._cache = OrderedDict()   # key -> (img, nbytes)
+        self._pending = {}            # key -> Future
+        self._lock = threading.Lock()
+        self._generation = 0          # 目录切换时递增，丢弃过期的后台结果
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="prefetch")
+
+        self.bytes_used = 0
+        self.hits = 0        # 缓存直接命中
+        self.waits = 0       # 后台正在解码，等待其完成
+        self.misses = 0      # 前台同步解码
+
+    # === 缓存键：路径 + mtime + 大小，文件被替换后自动失效 ===
+    def _key(self, path):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return (path, st.st_mtime_ns, st.st_size)
+
+    def get(self, path):
+        key = self._key(path)
+        if key is None:
+            raise FileNotFoundError(path)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[0]
+            fut = self._pending.get(key)
+
+        if fut is not None:
+            try:
+                img = fut.result()
+                with self._lock: self.waits += 1
+                if img is not None: return img
+            except Exception:
+                pass
+
+        with self._lock: self.misses += 1
+        img = self.decode(path)
+        with self._lock: self._put(key, img)
+        return img
+
+    # 不阻塞的 get (界面线程用)：命中返回 (图, None)；否则返回 (None, future)，
+    # future 完成后给出解码好的图 (失败为 None)，正在预取的直接复用
+    def get_nowait(self, path):
+        key = self._key(path)
+        if key is None:
+            raise FileNotFoundError(path)
+        with self._lock:
+            entry = self._cache.get(key)
+            if entry:
+                self._cache.move_to_end(key)
+                self.hits += 1
+                return entry[0], None
+            fut = self._pending.get(key)
+            if fut is None:
+                self.misses += 1
+                fut = self._pending[key] = self._pool.submit(self._work, path, key, self._generation)
+            else:
+                self.waits += 1
+        return None, fut
+
+    # names 为 folder 里的文件名列表，只为窗口内的几张拼路径，翻页开销和列表长度无关
+    def schedule(self, folder, names, index):
+        # 先排后面的 (用户主要往后翻)，再排前面的
+        order = [index + i for i in range(1, self.ahead + 1)]
+        order += [index - i for i in range(1, self.behind + 1)]
+        wanted = []
+        for i in order:
+            if 0 <= i < len(names):
+                path = os.path.join(folder, names[i])
+                key = self._key(path)
+                if key: wanted.append((path, key))
+
+        # 当前这张 (可能有人正等着 get_nowait 的结果) 也不取消
+        current = self._key(os.path.join(folder, names[index])) if 0 <= index < len(names) else None
+        with self._lock:
+            keep = {key for _, key in wanted} | {current}
+            # 窗口外且尚未开始的任务直接取消
+            for key, fut in list(self._pending.items()):
+                if key not in keep and fut.cancel():
+                    del self._pending[key]
+            gen = self._generation
+            for path, key in wanted:
+                if key in self._cache or key in self._pending: continue
+                self._pending[key] = self._pool.submit(self._work, path, key, gen)
+
+    def _work(self, path, key, gen):
+        try:
+            img = self.decode(path)
+        except Exception as e:
+            print(f"[Prefetch] decode failed: {os.path.basename(path)} ({e})")
+            img = None
+        with self._lock:
+            if gen == self._generation:
+                self._pending.pop(key, None)
+                if img is not None: self._put(key, img)
+        return img
+
+    def _put(self, key, img):
+        if key in self._cache:
+            self.bytes_used -= self._cache.pop(key)[1]
+        n = image_nbytes(img)
+        self._cache[key] = (img, n)
+        self.bytes_used += n
+        # 至少保留刚放入的这一张
+        while self.bytes_used > self.budget and len(self._cache) > 1:
+            _, (_, old_n) = self._cache.popitem(last=False)
+            self.bytes_used -= old_n
+
+    # 原图全分辨率解码 (不进 LRU，由调用方持有)
+    def submit_full(self, path):
+        return self._pool.submit(decode_image, path)
+
+    def invalidate(self, path=None):
+        with self._lock:
+            if path is None:
+                self._generation += 1
+                for fut in self._pending.values(): fut.cancel()
+                self._pending.clear()
+                self._cache.clear()
+                self.bytes_used = 0
+                return
+            for key in [k for k in self._cache if k[0] == path]:
+                self.bytes_used -= self._cache.pop(key)[1]
+            for key in [k for k in self._pending if k[0] == path]:
+                self._pending.pop(key).cancel()
+
+    def stats(self):
+        with self._lock:
+            total = self.hits + self.waits + self.misses
+            return {
+                "hits": self.hits, "waits": self.waits, "misses": self.misses,
+                "hit_rate": (self.hits / total) if total else 0.0,
+                "cached": len(self._cache), "pending": len(self._pending),
+                "mb": self.bytes_used / (1024 * 1024),
+            }
+
+    def shutdown(self):
+        self.invalidate()
+        self._pool.shutdown(wait=False)
@@ -1,20 +1,36 @@
 import tkinter as tk
 from tkinter import messagebox, ttk, simpledialog
-from PIL import Image, ImageTk, ImageDraw, ImageGrab
+from PIL import Image, ImageTk, ImageGrab
 import os
 import shutil
 import re
-import threading 
+import math
+from collections import OrderedDict
+import time
+import threading
+import importlib.util
+import bisect
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
 import config
+import timing
 from trash_ui import TrashWindow
+from image_cache import ImagePrefetcher, decode_proxy, crop_rotated
+from render_cache import ImagePyramid, TileCache, PhotoBuffer
+from save_queue import SaveJob, SaveQueue
+from thumb_cache import get_thumb_cache
+from file_ops import get_file_ops
+from dir_watcher import DirWatcher
+from upscale_plan import plan_upscale
 import ctypes
 
-try:
-    from upscaler import get_upscaler
-    HAS_AI = True
-except ImportError:
-    HAS_AI = False
-    print("Warning: upscaler.py not found or dependencies missing.")
+# 只检查依赖是否存在，不在启动时导入 numpy / onnxruntime
+HAS_AI = all(importlib.util.find_spec(m) is not None for m in ("numpy", "onnxruntime", "upscaler"))
+if not HAS_AI: print("Warning: upscaler.py not found or dependencies missing.")
+
+def get_upscaler(model_path=None):
+    from upscaler import get_upscaler as _get_upscaler
+    return _get_upscaler(model_path)
 
 try:
     ctypes.windll.shcore.SetProcessDpiAwareness(1)
@@ -55,16 +71,68 @@ class MaskCropper:
         self.min_scale = 1.0
         self.rotation = 0 
         self.img_x = 0; self.img_y = 0
-        self.original_image = None 
-        self.display_image = None 
+        self.original_image = None    # 当前用于显示的源图 (可能是缩小的代理图，未旋转)
+        self.pyramid = None           # original_image 的多级金字塔，draw() 从这里取图
+        self.tiles = TileCache(config.TILE_SIZE, config.TILE_CACHE_MB)
+        self.view_id = 0              # 显示源图每换一次 +1，作为瓦片缓存键的一部分
+        self.drawn = None             # 画布上现有图片对应的 (view_id, rotation, scale, 区域)，拖拽时直接平移它
+        self.mask_images = OrderedDict()  # (尺寸, 颜色) -> PhotoImage，遮罩条带复用
+        self.mask_canvas_size = None
+        self._resize_job = None
+        # === 代理图 / 原图分离：所有坐标 (scale, img_x, 裁剪框) 都以原图像素为单位 ===
+        self.current_path = None
+        self.full_size = (0, 0)       # 原图尺寸 (未旋转)
+        self.src_w = 0; self.src_h = 0  # 原图尺寸 (旋转后)
+        self.full_image = None        # 原图全分辨率，后台解码完成后填入
+        self.full_future = None
+        self.full_future_held = False # full_future 已交给保存任务，换图时不能取消
+        self.want_full_view = False   # 放大到代理图不够清晰时，等原图解码完切换
         self.last_deleted_info = None 
-        self.is_processing = False
         
-        # === 优化核心：交互状态标记 ===
-        self.is_moving_action = False # 是否正在拖拽/缩放中
+        # === 后台保存队列：按保存后立即翻到下一张，编码/写盘/AI 都在工作线程 ===
+        self.save_queue = SaveQueue(self.run_save_task, config.SAVE_WORKERS, config.SAVE_MAX_PENDING,
+                                    config.SAVE_ORDERED, config.SAVE_FULL_POLICY,
+                                    on_update=lambda job: self.root.after(0, lambda: self.on_save_update(job)))
+        # 队列满且 policy="block" 时界面线程不等待：任务先停在这里，有任务结束腾出空位再提交
+        self.save_waiting = None
+        self.retry_waiting = False
+        
+        # === 预读取：后台解码前后几张，翻页时直接命中缓存 ===
+        self.prefetcher = ImagePrefetcher(config.PREFETCH_AHEAD, config.PREFETCH_BEHIND,
+                                          config.PREFETCH_CACHE_MB, config.PREFETCH_WORKERS)
+        self.prefetch_dir = None
+        if config.PROXY_DECODE:
+            self.prefetcher.decode = lambda p: decode_proxy(p, self.box_w, self.box_h)
+        
+        # === 优化核心：交互状态 + 按帧合并的渲染调度 ===
+        # interactive: 正在拖拽/滚轮缩放，用最快的画质；settled: 停下来了，渲染高画质
+        self.view_state = "settled"
+        self._frame_job = None        # 已排队的下一帧
+        self._settle_job = None       # 滚轮停止检测
+        self.last_frame_time = 0.0
+        self.frame_times = deque(maxlen=60)
+        self.frames_rendered = 0
+        self.draw_requests = 0
+        self.dropped_events = 0       # 被合并掉 (没有单独渲染) 的事件数
+        # === 渐进式画质：停下后先出快速预览，后台再算高画质版本替换上去 ===
+        self.refine_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="refine")
+        self.refine_gen = 0           # 每次重绘/开始交互 +1，旧的后台任务自动作废
+        self.drawn_pil = None
+        self.view_buffer = PhotoBuffer()  # 画布主图，尺寸不变时复用
+
+        # === 预测性 AI 放大：裁剪框停住一会儿就在后台先放大，按保存时参数一致直接用结果 ===
+        self.spec_pool = ThreadPoolExecutor(max_workers=1, thread_name_prefix="speculate")
+        self.spec = None              # (key, SaveJob, Future)
+        self._spec_job = None
+        self.spec_stats = {"started": 0, "hits": 0, "wasted": 0, "wasted_sec": 0.0}
+
+        # === 目录监视：新增/删除的图片自动并入列表 ===
+        self.watcher = None
+        self.new_files = []           # 监视到的新图 (还没跳转过去看)
 
         self.current_preview_pil = None
-        self.preview_tk_img = None
+        self.preview_path = None      # 正在等后台缩略图的结果图路径
+        self.preview_buffer = PhotoBuffer()
         self.result_overlay = None
         self.bg_photo = None 
 
@@ -77,6 +145,7 @@ class MaskCropper:
             if not os.path.exists(d): os.makedirs(d)
 
     def startup_sequence(self):
+        self.resolve_file_ops()
         self.full_refresh()
         if self.combo_dir['values']: 
             self.combo_dir.current(0) 
@@ -94,8 +163,25 @@ class MaskCropper:
             self.box_cx = (config.WIN_WIDTH - 260) // 2
             self.box_cy = config.WIN_HEIGHT // 2
         
+        timing.mark("first paint")
         self.update_box_shape(force_render=True) 
         self.reload_images(check_changes=False)
+        if HAS_AI and config.AI_WARMUP:
+            threading.Thread(target=self.warmup_ai, daemon=True).start()
+
+    # === 后台预热 AI：导入 onnxruntime、创建会话、跑一次小推理，首张 AI 保存不再多等几秒 ===
+    def warmup_ai(self):
+        ready = False
+        try:
+            upscaler = get_upscaler()
+            ready = upscaler.is_ready and upscaler.warmup()
+        except Exception as e:
+            print(f"[Error] AI warm-up failed: {e}")
+        timing.mark("ai ready")
+        self.root.after(0, lambda: self.on_ai_ready(ready))
+
+    def on_ai_ready(self, ready):
+        if self.cb_ai: self.cb_ai.config(text="✨ AI修复" if ready else "✨ AI修复 (不可用)")
 
     def setup_ui(self):
         top_bar = tk.Frame(self.root, bg="#333333", pady=8, padx=10)
@@ -123,9 +209,10 @@ class MaskCropper:
         self.combo_ratio.pack(side=tk.LEFT, padx=5)
         self.combo_ratio.bind("<<ComboboxSelected>>", self.on_ratio_change)
         
+        self.cb_ai = None
         if HAS_AI:
-            cb_ai = ttk.Checkbutton(top_bar, text="✨ AI修复", variable=self.use_ai_upscale, style="Dark.TCheckbutton")
-            cb_ai.pack(side=tk.LEFT, padx=(20, 5))
+            self.cb_ai = ttk.Checkbutton(top_bar, text="✨ AI修复 (加载中…)", variable=self.use_ai_upscale, style="Dark.TCheckbutton", command=self.on_ai_toggle)
+            self.cb_ai.pack(side=tk.LEFT, padx=(20, 5))
         
         ttk.Checkbutton(top_bar, text="井字构图线", variable=self.show_grid, command=self.create_overlay, style="Dark.TCheckbutton").pack(side=tk.RIGHT, padx=10)
 
@@ -195,6 +282,16 @@ class MaskCropper:
         self.l_warning = tk.Label(info_frame, text="", bg=config.PANEL_COLOR, fg="#FF5555", font=("Microsoft YaHei", 8), justify="left")
         self.l_warning.pack(anchor="w", padx=15)
 
+        # 保存队列状态 (非模态)，有失败任务时点击重试
+        self.l_queue = tk.Label(info_frame, text="", bg=config.PANEL_COLOR, fg=config.COLOR_TEXT_SUB, font=("Microsoft YaHei", 8), justify="left", wraplength=230)
+        self.l_queue.pack(anchor="w", padx=15, pady=(6, 0))
+        self.l_queue.bind("<Button-1>", lambda e: self.retry_failed_saves())
+
+        # 目录里出现的新图 (非模态)，点击跳转到第一张
+        self.l_new = tk.Label(info_frame, text="", bg=config.PANEL_COLOR, fg="#4FC3F7", font=("Microsoft YaHei", 8), justify="left", cursor="hand2")
+        self.l_new.pack(anchor="w", padx=15, pady=(4, 0))
+        self.l_new.bind("<Button-1>", lambda e: self.jump_to_new())
+
         tk.Label(self.panel, text="结果预览 (点击放大):", **style_h).pack(side=tk.TOP, anchor="w", padx=15, pady=(15, 5))
         
         self.preview_frame = tk.Frame(self.panel, bg="#111111", relief="sunken", bd=1, cursor="hand2")
@@ -216,7 +313,7 @@ class MaskCropper:
         self.canvas.bind("<MouseWheel>", self.on_wheel)
         self.canvas.bind("<Button-4>", self.on_wheel)
         self.canvas.bind("<Button-5>", self.on_wheel)
-        self.canvas.bind("<Configure>", lambda e: self.create_overlay())
+        self.canvas.bind("<Configure>", self.on_canvas_configure)
         
         r = self.root
         r.bind("<Right>", lambda e: self.save())
@@ -252,6 +349,7 @@ class MaskCropper:
         self.fix_pos()
         self.draw()
         self.update_resolution_label()
+        self.schedule_speculation()
 
     def on_ratio_change(self, event=None):
         val = self.target_ratio_str.get()
@@ -286,7 +384,8 @@ class MaskCropper:
                 
                 self.previous_ratio = "自定义..."
                 self.update_box_shape(force_render=True)
-                if self.display_image: self.fix_pos(); self.draw()
+                if self.pyramid: self.fix_pos(); self.draw()
+                self.schedule_speculation()
             except:
                 messagebox.showwarning("格式错误", "无法解析输入。\n请尝试: 512x512 或 16:9")
                 self.target_ratio_str.set(self.previous_ratio)
@@ -294,7 +393,8 @@ class MaskCropper:
             self.fixed_target_size = None
             self.previous_ratio = val
             self.update_box_shape(force_render=True)
-            if self.display_image: self.fix_pos(); self.draw()
+            if self.pyramid: self.fix_pos(); self.draw()
+            self.schedule_speculation()
 
     def update_box_shape(self, force_render=False):
         ratio_str = self.target_ratio_str.get()
@@ -317,7 +417,9 @@ class MaskCropper:
             target_w, target_h = self.fixed_target_size
             self.l_crop_res.config(text=f"锁定: {target_w} x {target_h}", fg="#00CCFF")
             if current_res_w < target_w * 0.95:
-                if self.use_ai_upscale.get() and HAS_AI: self.l_warning.config(text="✨ AI 将介入增强画质", fg="#4EC9B0")
+                if self.use_ai_upscale.get() and HAS_AI:
+                    plan = plan_upscale((self.box_w / self.scale, self.box_h / self.scale), self.fixed_target_size)
+                    self.l_warning.config(text=plan.describe(), fg="#4EC9B0" if plan.use_ai else "#FFB74D")
                 else:
                     ratio = target_w / current_res_w
                     self.l_warning.config(text=f"⚠️ 注意: 正在放大 {ratio:.1f}倍", fg="#FF5555")
@@ -326,6 +428,10 @@ class MaskCropper:
             self.l_crop_res.config(text=f"{current_res_w} x {current_res_h}", fg="#4CAF50")
             self.l_warning.config(text="", fg="#1E1E1E")
 
+    def on_ai_toggle(self):
+        self.update_resolution_label()
+        self.schedule_speculation()
+
     def full_refresh(self, check_changes=False):
         try:
             items = os.listdir(config.INPUT_ROOT)
@@ -361,6 +467,11 @@ class MaskCropper:
             self.link_open_in.config(text=f"📂 源: [ {display_name} ]")
             self.link_open_out.config(text=f"💾 存: [ {display_name} ]")
 
+        # 切换目录：旧目录的缓存全部作废
+        if self.prefetch_dir != self.curr_in:
+            self.prefetcher.invalidate()
+            self.prefetch_dir = self.curr_in
+
         config.SAVE_TRASH_ROOT = os.path.join(config.BASE_DIR, 'trash_bin_save') 
         for d in [self.curr_out, self.curr_trash, config.SAVE_TRASH_ROOT]: 
             if not os.path.exists(d): os.makedirs(d)
@@ -369,32 +480,30 @@ class MaskCropper:
         if os.path.exists(self.curr_in):
             disk_files = sorted([f for f in os.listdir(self.curr_in) if f.lower().endswith(('.jpg','.png','.webp','.bmp','.tif','.jpeg'))])
         
-        jump = False
         if check_changes and self.image_list:
             old_set = set(self.image_list)
             disk_set = set(disk_files)
-            added = list(disk_set - old_set)
-            added.sort()
-            kept = [f for f in self.image_list if f in disk_set]
-            self.image_list = kept + added
-            if added:
-                new_idx = len(kept)
-                if messagebox.askyesno("新文件", f"发现 {len(added)} 张新图，是否跳转？"):
-                    self.current_index = new_idx
-                    jump = True
+            added = sorted(disk_set - old_set)
+            self.image_list = [f for f in self.image_list if f in disk_set]
+            for f in added: bisect.insort(self.image_list, f)
+            self.note_new_files(added)
         else:
             self.image_list = disk_files
             self.current_index = 0
+            self.note_new_files(None)
+        self.start_watcher(disk_files)
 
-        if not jump:
-            if current_focus and current_focus in self.image_list: self.current_index = self.image_list.index(current_focus)
-            else: self.current_index = 0
+        if current_focus and current_focus in self.image_list: self.current_index = self.image_list.index(current_focus)
+        else: self.current_index = 0
 
         if self.image_list: self.load_image()
         else: self.reset_canvas()
 
     def reset_canvas(self):
-        self.original_image = None; self.display_image = None
+        self.drawn = None
+        if self.pyramid: self.pyramid.cancel()
+        self.original_image = None; self.pyramid = None
+        self.current_path = None; self.full_image = None; self.full_future = None; self.full_future_held = False
         self.canvas.delete("img")
         self.l_name.config(text="[无图片]"); self.l_prog.config(text="-- / --")
         self.l_size.config(text="--"); self.l_crop_res.config(text="-- x --")
@@ -412,23 +521,48 @@ class MaskCropper:
         
         fname = self.image_list[self.current_index]
         try:
-            self.original_image = Image.open(os.path.join(self.curr_in, fname)).convert('RGB')
+            path = os.path.join(self.curr_in, fname)
+            misses = self.prefetcher.misses
+            decoded = self.prefetcher.get(path)
+            if self.prefetcher.misses != misses:
+                st = self.prefetcher.stats()
+                print(f"[Cache] miss: {fname} (hit {st['hits']} / wait {st['waits']} / miss {st['misses']}, {st['mb']:.0f} MB)")
+            if self.full_future and not self.full_future_held: self.full_future.cancel()
+            self.full_future_held = False
+            self.current_path = path
+            self.original_image = decoded.image
+            self.full_size = decoded.full_size
+            self.want_full_view = False
+            if decoded.is_full:
+                self.full_image = decoded.image; self.full_future = None
+            else:
+                # 趁用户摆放裁剪框时，后台解码原图供保存/放大使用
+                self.full_image = None
+                self.full_future = self.prefetcher.submit_full(path)
+                self.full_future.add_done_callback(lambda f, p=path: self.root.after(0, lambda: self.on_full_ready(p, f)))
+            if self.pyramid: self.pyramid.cancel()
+            self.pyramid = ImagePyramid(self.original_image, self.full_size, config.PYRAMID_MIN_SIDE)
+            self.view_id += 1; self.tiles.clear()
             self.rotation = 0
             self.update_box_shape(force_render=False) 
             self.create_overlay() 
             self.update_display()
             self.l_name.config(text=fname)
             self.l_prog.config(text=f"{self.current_index+1} / {len(self.image_list)}")
-            self.l_size.config(text=f"{self.original_image.width} x {self.original_image.height}")
+            self.l_size.config(text=f"{self.full_size[0]} x {self.full_size[1]}")
             self.refresh_preview_area()
+            self.prefetcher.schedule(self.curr_in, self.image_list, self.current_index)
+            timing.mark("first image")
         except Exception as e:
             print(f"Error: {e}"); self.current_index += 1; self.load_image()
 
     def update_display(self):
         if not self.original_image: return
-        if self.rotation == 0: self.display_image = self.original_image.copy()
-        else: self.display_image = self.original_image.rotate(self.rotation, expand=True)
-        w, h = self.display_image.size
+        # 换图 / 旋转：旧的预测任务肯定用不上了
+        self.discard_speculation()
+        self.schedule_speculation()
+        self.update_source_size()
+        w, h = self.src_w, self.src_h
         
         if self.box_w > 0 and self.box_h > 0: self.min_scale = max(self.box_w/w, self.box_h/h)
         else: self.min_scale = 1.0
@@ -438,58 +572,126 @@ class MaskCropper:
         self.fix_pos() 
         self.draw()
 
+    def update_source_size(self):
+        # 旋转只影响坐标系，整图不再旋转 (金字塔按可见区域旋转)
+        fw, fh = self.full_size
+        self.src_w, self.src_h = (fw, fh) if self.rotation in (0, 180) else (fh, fw)
+
+    # === 原图解码完成 (Tk 线程) ===
+    def on_full_ready(self, path, future):
+        if path != self.current_path or future is not self.full_future: return
+        try: self.full_image = future.result()
+        except Exception as e: print(f"[Error] full decode failed: {e}"); return
+        if self.want_full_view: self.switch_to_full_view(); self.draw()
+
+    def switch_to_full_view(self):
+        self.want_full_view = False
+        if self.original_image is self.full_image: return
+        self.original_image = self.full_image
+        self.pyramid.set_base(self.full_image)
+        self.view_id += 1; self.tiles.clear()
+
+    # 当前缩放下代理图已被放大显示 -> 需要原图
+    def check_full_view_needed(self):
+        if not self.pyramid or self.original_image is self.full_image: return
+        if self.scale * self.full_size[0] <= self.original_image.width: return
+        if self.full_image is not None: self.switch_to_full_view()
+        else: self.want_full_view = True
+
+    def get_full_image(self):
+        if self.full_image is None:
+            if self.full_future is not None: self.full_image = self.full_future.result()
+            else: self.full_image = Image.open(self.current_path).convert('RGB')
+        return self.full_image
+
+    # 窗口拖动缩放会连续触发 <Configure>，停下来后再重建遮罩
+    def on_canvas_configure(self, event=None):
+        if self._resize_job: self.root.after_cancel(self._resize_job)
+        self._resize_job = self.root.after(config.RESIZE_DEBOUNCE_MS, self.create_overlay)
+
+    def mask_image(self, size, color=(0, 0, 0, config.MASK_OPACITY)):
+        key = (size, color)
+        img = self.mask_images.get(key)
+        if img is None:
+            img = ImageTk.PhotoImage(Image.new('RGBA', size, color))
+            self.mask_images[key] = img
+            while len(self.mask_images) > 64: self.mask_images.popitem(last=False)
+        else: self.mask_images.move_to_end(key)
+        return img
+
+    # === 遮罩层：边框/井字线用矢量图元，半透明暗区用复用的条带图拼 ===
+    # 上下两块直接用整画布大小的暗图按框边对齐；左右两块按框高拆成 2 的幂次高度的条带，
+    # 调整框大小时只是换几个图元的位置，不再每次生成整画布 RGBA 图
     def create_overlay(self):
+        self._resize_job = None
         cw = self.canvas.winfo_width()
         ch = self.canvas.winfo_height()
         if cw < 10: cw = config.WIN_WIDTH - 260; ch = config.WIN_HEIGHT
         self.box_cx, self.box_cy = cw // 2, ch // 2
-        mask = Image.new('RGBA', (cw, ch), (0, 0, 0, config.MASK_OPACITY))
         r_w = self.box_w // 2; r_h = self.box_h // 2
         self.box_x1 = self.box_cx - r_w; self.box_y1 = self.box_cy - r_h
         self.box_x2 = self.box_cx + r_w; self.box_y2 = self.box_cy + r_h
-        draw = ImageDraw.Draw(mask)
-        draw.rectangle([self.box_x1, self.box_y1, self.box_x2, self.box_y2], fill=(0,0,0,0), outline="#00FF00", width=2)
-        mask.paste((0,0,0,0), (int(self.box_x1), int(self.box_y1), int(self.box_x2), int(self.box_y2)))
+        x1, y1, x2, y2 = int(self.box_x1), int(self.box_y1), int(self.box_x2), int(self.box_y2)
+        
+        c = self.canvas
+        c.delete("mask")
+        # 画布尺寸变了，旧尺寸的条带都用不上了
+        if self.mask_images and (cw, ch) != self.mask_canvas_size: self.mask_images.clear()
+        self.mask_canvas_size = (cw, ch)
+        full = self.mask_image((cw, ch))
+        c.create_image(0, y1, image=full, anchor=tk.SW, tags="mask")
+        c.create_image(0, y2, image=full, anchor=tk.NW, tags="mask")
+        y, rest = y1, y2 - y1
+        while rest > 0:
+            bar_h = 1 << (rest.bit_length() - 1)
+            bar = self.mask_image((cw, bar_h))
+            c.create_image(x1, y, image=bar, anchor=tk.NE, tags="mask")
+            c.create_image(x2, y, image=bar, anchor=tk.NW, tags="mask")
+            y += bar_h; rest -= bar_h
+        
         if self.show_grid.get():
             gc = (255,255,255,80)
             step_w = self.box_w / 3; step_h = self.box_h / 3
+            v_line = self.mask_image((1, max(1, y2 - y1)), gc)
+            h_line = self.mask_image((max(1, x2 - x1), 1), gc)
             for i in range(1,3):
-                draw.line([(self.box_x1+i*step_w, self.box_y1), (self.box_x1+i*step_w, self.box_y2)], fill=gc)
-                draw.line([(self.box_x1, self.box_y1+i*step_h), (self.box_x2, self.box_y1+i*step_h)], fill=gc)
-        self.tk_mask = ImageTk.PhotoImage(mask)
-        self.canvas.delete("mask")
-        self.canvas.create_image(0, 0, image=self.tk_mask, anchor=tk.NW, tags="mask")
-        self.canvas.tag_raise("mask")
+                c.create_image(int(self.box_x1 + i*step_w), y1, image=v_line, anchor=tk.NW, tags="mask")
+                c.create_image(x1, int(self.box_y1 + i*step_h), image=h_line, anchor=tk.NW, tags="mask")
+        c.create_rectangle(x1, y1, x2, y2, outline="#00FF00", width=2, tags="mask")
+        c.tag_raise("mask")
+        # 框的位置随画布大小变了，裁剪区域也跟着变
+        self.schedule_speculation()
 
     def fix_pos(self):
-        if not self.display_image: return
-        w = self.display_image.width * self.scale
-        h = self.display_image.height * self.scale
-        if w < self.box_w: self.scale = self.box_w / self.display_image.width; w = self.box_w
-        if h < self.box_h: self.scale = max(self.scale, self.box_h / self.display_image.height); h = self.display_image.height * self.scale
+        if not self.pyramid: return
+        w = self.src_w * self.scale
+        h = self.src_h * self.scale
+        if w < self.box_w: self.scale = self.box_w / self.src_w; w = self.box_w
+        if h < self.box_h: self.scale = max(self.scale, self.box_h / self.src_h); h = self.src_h * self.scale
         if self.img_x > self.box_x1: self.img_x = self.box_x1
         if self.img_x + w < self.box_x2: self.img_x = self.box_x2 - w
         if self.img_y > self.box_y1: self.img_y = self.box_y1
         if self.img_y + h < self.box_y2: self.img_y = self.box_y2 - h
+        self.check_full_view_needed()
 
-    # === 关键性能优化：动态画质调节 + 视口裁剪 ===
+    # === 关键性能优化：动态画质调节 + 视口裁剪 + 金字塔取级 ===
     def draw(self):
-        if not self.display_image: return
+        if not self.pyramid: return
         
         cw = self.canvas.winfo_width()
         ch = self.canvas.winfo_height()
-        w = int(self.display_image.width * self.scale)
-        h = int(self.display_image.height * self.scale)
+        w = int(self.src_w * self.scale)
+        h = int(self.src_h * self.scale)
         
         # 优化策略：
-        # 1. 正在拖拽中 (is_moving_action=True) -> 强制 NEAREST (极速)
+        # 1. 正在拖拽/缩放中 (view_state=interactive) -> 强制 NEAREST (极速)
         # 2. 图片极大且放大中 -> 视口裁剪 + NEAREST
-        # 3. 其他情况 -> BILINEAR (平滑)
+        # 3. 其他情况 -> 先用缓存里现成的瓦片 (缺的用 NEAREST 补) 出预览，后台渐进换成 BILINEAR -> LANCZOS
         
         use_nearest = False
         PERFORMANCE_LIMIT = 2000 * 2000 # 400万像素阈值
         
-        if self.is_moving_action:
+        if self.view_state == "interactive":
             # 拖拽中，为了跟手，一律用最近邻
             use_nearest = True
         elif (w * h > PERFORMANCE_LIMIT) and (self.scale > 1.2):
@@ -497,165 +699,336 @@ class MaskCropper:
             use_nearest = True
             
         try:
-            # === 视口裁剪逻辑 ===
-            vis_x1 = max(0, self.img_x)
-            vis_y1 = max(0, self.img_y)
-            vis_x2 = min(cw, self.img_x + w)
-            vis_y2 = min(ch, self.img_y + h)
+            # === 视口裁剪逻辑 (缩放后图像坐标系，整数像素) ===
+            # 拖拽中 (缩放没变) 四周多渲染一圈 (overscan)，之后的移动只需平移画布上的图片；
+            # 缩放帧、停下后的预览/精修用不上这圈，只渲染视口
+            ox = int(round(self.img_x)); oy = int(round(self.img_y))
+            panning = self.view_state == "interactive" and self.drawn is not None and \
+                self.drawn[:3] == (self.view_id, self.rotation, self.scale)
+            m = config.DRAG_OVERSCAN if panning else 0
+            vis_x1 = max(0, -ox - m)
+            vis_y1 = max(0, -oy - m)
+            vis_x2 = min(cw - ox + m, math.ceil(self.src_w * self.scale))
+            vis_y2 = min(ch - oy + m, math.ceil(self.src_h * self.scale))
             
             if vis_x2 <= vis_x1 or vis_y2 <= vis_y1:
-                self.canvas.delete("img")
+                self.canvas.delete("img"); self.drawn = None
                 return
 
-            # 映射回原图坐标
-            src_x1 = (vis_x1 - self.img_x) / self.scale
-            src_y1 = (vis_y1 - self.img_y) / self.scale
-            src_x2 = (vis_x2 - self.img_x) / self.scale
-            src_y2 = (vis_y2 - self.img_y) / self.scale
-            
-            crop_box = (int(src_x1), int(src_y1), int(src_x2) + 1, int(src_y2) + 1)
-            part = self.display_image.crop(crop_box)
-            
-            dest_w = int(vis_x2 - vis_x1)
-            dest_h = int(vis_y2 - vis_y1)
-            
-            # 根据策略选择算法
-            algo = Image.Resampling.NEAREST if use_nearest else Image.Resampling.BILINEAR
-            resized = part.resize((dest_w, dest_h), algo)
+            # 根据策略选择算法；由瓦片缓存拼出可见区域，只渲染缺的格子
+            refine = config.PROGRESSIVE_REFINE and not use_nearest
+            algo = Image.Resampling.NEAREST if (use_nearest or refine) else Image.Resampling.BILINEAR
+            min_q = 0 if (self.view_state == "interactive" or refine) else None
+            resized = self.tiles.compose(self.pyramid, self.view_id, self.rotation, self.scale,
+                                         (self.src_w, self.src_h), (vis_x1, vis_y1, vis_x2, vis_y2), algo, min_q)
             
-            self.tk_img = ImageTk.PhotoImage(resized)
-            self.canvas.delete("img")
-            self.canvas.create_image(vis_x1, vis_y1, image=self.tk_img, anchor=tk.NW, tags="img")
-            self.canvas.tag_lower("img", "mask")
+            # 画布图元和 PhotoImage 都复用：尺寸没变就只 paste 像素 + 挪位置
+            new_photo = self.view_buffer.show(resized)
+            if self.canvas.find_withtag("img"):
+                self.canvas.coords("img", ox + vis_x1, oy + vis_y1)
+                if new_photo: self.canvas.itemconfig("img", image=self.view_buffer.photo)
+            else:
+                self.canvas.create_image(ox + vis_x1, oy + vis_y1, image=self.view_buffer.photo, anchor=tk.NW, tags="img")
+                self.canvas.tag_lower("img", "mask")
+            self.drawn = (self.view_id, self.rotation, self.scale, (vis_x1, vis_y1, vis_x2, vis_y2))
+            self.drawn_pil = resized
             self.update_resolution_label()
+            self.refine_gen += 1
+            if refine:
+                # 只精修真正看得见的那部分 (不含 overscan)
+                vis = (max(0, -ox), max(0, -oy), min(cw - ox, vis_x2), min(ch - oy, vis_y2))
+                self.refine_pool.submit(self.refine_worker, self.refine_gen, self.drawn, vis,
+                                        self.pyramid, self.src_w, self.src_h)
             
         except Exception as e:
             pass
 
+    # 后台线程：按 REFINE_FILTERS 逐级算出更清晰的可见区域
+    def refine_worker(self, gen, key, vis, pyramid, src_w, src_h):
+        rotation, scale = key[1], key[2]
+        x1, y1, x2, y2 = vis
+        if x2 <= x1 or y2 <= y1: return
+        box = (x1 / scale, y1 / scale, min(src_w, x2 / scale), min(src_h, y2 / scale))
+        for name in config.REFINE_FILTERS:
+            if gen != self.refine_gen: return
+            try: img = pyramid.render(rotation, box, (x2 - x1, y2 - y1), getattr(Image.Resampling, name))
+            except Exception as e: print(f"[Refine] failed: {e}"); return
+            self.root.after(0, lambda im=img: self.apply_refine(gen, key, vis, im))
+
+    def apply_refine(self, gen, key, vis, img):
+        # 视图已经变了 (拖动/缩放/换图)，结果作废
+        if gen != self.refine_gen or key != self.drawn: return
+        rx1, ry1 = key[3][:2]
+        frame = self.drawn_pil.copy()
+        frame.paste(img, (vis[0] - rx1, vis[1] - ry1))
+        if self.view_buffer.show(frame): self.canvas.itemconfig("img", image=self.view_buffer.photo)
+
+    # === 渲染调度：事件只标记“需要重绘”，每帧最多真正渲染一次，用的永远是最新的位置/缩放 ===
+    def request_draw(self):
+        self.draw_requests += 1
+        if self._frame_job:
+            self.dropped_events += 1
+            return
+        interval = 1.0 / config.TARGET_FPS
+        wait = max(0.0, interval - (time.perf_counter() - self.last_frame_time))
+        if wait > 0: self._frame_job = self.root.after(int(wait * 1000), self.render_frame)
+        else: self._frame_job = self.root.after_idle(self.render_frame)
+
+    def render_frame(self):
+        self._frame_job = None
+        now = time.perf_counter()
+        self.last_frame_time = now
+        self.frame_times.append(now)
+        self.frames_rendered += 1
+        self.draw()
+
+    def render_stats(self):
+        t = self.frame_times
+        fps = (len(t) - 1) / (t[-1] - t[0]) if len(t) > 1 and t[-1] > t[0] else 0.0
+        return {"fps": fps, "frames": self.frames_rendered, "requests": self.draw_requests, "dropped": self.dropped_events}
+
+    def begin_interaction(self):
+        if self._settle_job: self.root.after_cancel(self._settle_job); self._settle_job = None
+        self.refine_gen += 1
+        if self.view_state != "interactive":
+            self.view_state = "interactive"
+            self.frame_times.clear()
+            # 裁剪参数要变了：预测任务只在开始交互时作废一次，停下后 settle 再重新计时
+            if self._spec_job: self.root.after_cancel(self._spec_job); self._spec_job = None
+            self.discard_speculation()
+
+    # 交互结束 (delay 毫秒后)：切回 settled 并补一帧高画质
+    def end_interaction(self, delay=0):
+        if self._settle_job: self.root.after_cancel(self._settle_job)
+        self._settle_job = self.root.after(delay, self.settle)
+
+    def settle(self):
+        self._settle_job = None
+        if self.view_state == "settled": return
+        self.view_state = "settled"
+        if config.SHOW_RENDER_STATS:
+            st = self.render_stats()
+            print(f"[Render] {st['fps']:.1f} fps | frames {st['frames']} | requests {st['requests']} | dropped {st['dropped']}")
+        self.request_draw()
+        self.schedule_speculation()
+
     def on_down(self, e): 
         self.lx, self.ly = e.x, e.y
-        self.is_moving_action = True # 开始拖拽
+        self.begin_interaction() # 开始拖拽
 
     def on_release(self, e):
         # 鼠标松开，恢复高质量渲染
-        self.is_moving_action = False
-        self.draw() # 触发一次重绘，变清晰
+        self.end_interaction()
 
     def on_drag(self, e):
         self.img_x += e.x - self.lx; self.img_y += e.y - self.ly
         self.lx, self.ly = e.x, e.y
         self.fix_pos()
-        self.draw()
+        # 缩放没变且 overscan 还够用：只移动画布上的图片，不重新渲染
+        if not self.move_drawn(): self.request_draw()
+
+    def move_drawn(self):
+        if not self.drawn or self.drawn[:3] != (self.view_id, self.rotation, self.scale): return False
+        x1, y1, x2, y2 = self.drawn[3]
+        cw = self.canvas.winfo_width(); ch = self.canvas.winfo_height()
+        ox = int(round(self.img_x)); oy = int(round(self.img_y))
+        if x1 > max(0, -ox) or y1 > max(0, -oy): return False
+        if x2 < min(cw - ox, math.ceil(self.src_w * self.scale)): return False
+        if y2 < min(ch - oy, math.ceil(self.src_h * self.scale)): return False
+        self.canvas.coords("img", ox + x1, oy + y1)
+        return True
 
     def on_wheel(self, e):
-        self.is_moving_action = True # 滚轮也是一种“动”
+        self.begin_interaction() # 滚轮也是一种“动”
         f = 1.1 if (e.num==4 or e.delta>0) else 0.9
-        if self.display_image:
-             w, h = self.display_image.size
+        if self.pyramid:
+             w, h = self.src_w, self.src_h
              self.min_scale = max(self.box_w/w, self.box_h/h)
         ns = max(self.scale * f, self.min_scale)
         self.img_x = e.x - (e.x - self.img_x) * (ns/self.scale)
         self.img_y = e.y - (e.y - self.img_y) * (ns/self.scale)
         self.scale = ns
         self.fix_pos()
-        self.draw()
+        self.request_draw()
         
-        # 滚轮停止检测比较麻烦，这里用定时器延时重置
-        # 如果 200ms 内没有新的滚轮事件，就认为停止了
-        if hasattr(self, '_wheel_timer'): self.root.after_cancel(self._wheel_timer)
-        self._wheel_timer = self.root.after(200, self.on_wheel_stop)
-
-    def on_wheel_stop(self):
-        self.is_moving_action = False
-        self.draw()
+        # 滚轮没有“松开”事件：一段时间内没有新的滚轮事件就认为停止了
+        self.end_interaction(config.WHEEL_SETTLE_MS)
 
     def rotate(self):
         if self.original_image: 
             self.rotation = (self.rotation-90)%360
+            self.tiles.clear()
             self.update_display()
             
     def prev(self):
         if self.current_index>0: self.current_index-=1; self.load_image()
     
-    def save(self):
-        if not self.image_list or self.current_index >= len(self.image_list): return
-        if self.is_processing: return 
-        
+    # 当前裁剪参数：旋转后原图坐标的裁剪框 + 放大规划 (不需要 AI 时为 None)
+    def save_params(self):
         rx = (self.box_x1 - self.img_x) / self.scale
         ry = (self.box_y1 - self.img_y) / self.scale
         rw = self.box_w / self.scale
         rh = self.box_h / self.scale
         crop_box = (rx, ry, rx+rw, ry+rh)
         
-        needs_ai = False
+        # 需要放大时规划最省的 AI 路线 (预缩 / 跳过 AI)
+        plan = None
         if self.fixed_target_size and self.use_ai_upscale.get() and HAS_AI:
             t_w, t_h = self.fixed_target_size
-            crop_w = rw
-            crop_h = rh
-            if t_w > crop_w or t_h > crop_h:
-                needs_ai = True
-
-        if needs_ai:
-            self.is_processing = True
-            self.show_loading("AI 正在努力放大中...")
-            threading.Thread(target=self.run_save_task, args=(crop_box, True)).start()
-        else:
-            self.run_save_task(crop_box, False)
+            if t_w > rw or t_h > rh:
+                plan = plan_upscale((rw, rh), self.fixed_target_size)
+                if not plan.use_ai: plan = None
+        return crop_box, plan
 
-    def run_save_task(self, crop_box, use_ai):
-        try:
-            crop = self.display_image.crop(crop_box)
-            if self.fixed_target_size:
-                target_w, target_h = self.fixed_target_size
-                if use_ai:
-                    upscaler = get_upscaler()
-                    if upscaler and upscaler.is_ready:
-                        high_res = upscaler.process(crop)
-                        crop = high_res.resize((target_w, target_h), Image.Resampling.LANCZOS)
-                        print("[Info] AI Upscale Success")
-                    else:
-                        crop = crop.resize((target_w, target_h), Image.Resampling.LANCZOS)
-                else:
-                    crop = crop.resize((target_w, target_h), Image.Resampling.LANCZOS)
-            
-            name = os.path.splitext(self.image_list[self.current_index])[0] + ".jpg"
-            save_path = os.path.join(self.curr_out, name)
-            crop.save(save_path, quality=98, subsampling=0)
-            print(f"Saved: {name}")
-            self.root.after(0, self.on_save_complete)
-        except Exception as e:
-            print(f"Save Error: {e}")
-            self.root.after(0, lambda: self.on_save_error(str(e)))
+    # 快照当前状态生成任务；原图优先用已解码好的 / 正在后台解码的
+    def make_save_job(self, crop_box, plan):
+        fname = self.image_list[self.current_index]
+        source = self.full_image if self.full_image is not None else (self.full_future or self.current_path)
+        if source is self.full_future: self.full_future_held = True
+        out_path = os.path.join(self.curr_out, os.path.splitext(fname)[0] + ".jpg")
+        return SaveJob(fname, source, self.rotation, crop_box, self.fixed_target_size, plan, out_path, self.current_path)
 
-    def on_save_complete(self):
-        self.hide_loading()
-        self.is_processing = False
-        self.refresh_preview_area()
+    # 结果完全相同的两次裁剪键值相同 (裁剪框按 crop_rotated 的取整方式比较)
+    def speculation_key(self, crop_box, plan):
+        if plan is None: return None
+        return (self.current_path, self.rotation, tuple(int(round(v)) for v in crop_box),
+                self.fixed_target_size, plan.model.session_path, plan.pre_size, plan.tile)
+
+    def save(self):
+        if not self.image_list or self.current_index >= len(self.image_list): return
+        if self.save_waiting: return   # 上一次保存还在等空位
+        crop_box, plan = self.save_params()
+        job = self.make_save_job(crop_box, plan)
+        key = self.speculation_key(crop_box, plan)
+        # 先挂上预测结果 (提交后工作线程可能马上开始)，提交成功才算命中、把预测任务交给这次保存
+        if self.spec and self.spec[0] == key: job.speculative = self.spec[2]
+        if not self.save_queue.submit(job, blocking=False):
+            if self.save_queue.policy == "block":
+                self.save_waiting = (job, key)
+                self.l_queue.config(text="⏳ 保存队列已满，有空位后自动保存并翻页", fg="#FFB74D", cursor="")
+            else:
+                self.l_queue.config(text="⚠️ 保存队列已满，请稍候", fg="#FF5555")
+            return
+        self.on_save_submitted(job, key)
+
+    def on_save_submitted(self, job, key):
+        if job.speculative is not None:
+            if self.spec and self.spec[2] is job.speculative:
+                self.spec = None
+                self.spec_stats["hits"] += 1
+            else:
+                job.speculative = None   # 等空位期间预测任务已被作废
+        if key is not None and config.AI_SPECULATE:
+            st = self.speculation_stats()
+            print(f"[Speculate] {'hit' if job.speculative else 'miss'} | hit rate {st['hits']}/{st['started']} ({st['hit_rate']:.0%}) | wasted {st['wasted']} jobs, {st['wasted_sec']:.1f}s")
+        # 等空位期间用户已经翻到别的图，就不再替他翻页
+        if job.path != self.current_path: return
         self.current_index += 1
         self.load_image()
 
-    def on_save_error(self, err_msg):
-        self.hide_loading()
-        self.is_processing = False
-        messagebox.showerror("Error", err_msg)
-
-    def show_loading(self, msg):
-        self.loading_win = tk.Toplevel(self.root)
-        self.loading_win.title("")
-        self.loading_win.geometry("300x100")
-        x = self.root.winfo_x() + (self.root.winfo_width()//2) - 150
-        y = self.root.winfo_y() + (self.root.winfo_height()//2) - 50
-        self.loading_win.geometry(f"+{x}+{y}")
-        self.loading_win.configure(bg="#2D2D2D")
-        self.loading_win.overrideredirect(True) 
-        self.loading_win.attributes("-topmost", True)
-        tk.Label(self.loading_win, text=msg, fg="white", bg="#2D2D2D", font=("Microsoft YaHei", 12)).pack(expand=True)
-        self.loading_win.update()
-
-    def hide_loading(self):
-        if hasattr(self, 'loading_win') and self.loading_win:
-            self.loading_win.destroy()
-            self.loading_win = None
+    # 有保存任务结束 (Tk 线程)：先交等待中的保存，再接着重试失败的任务
+    def submit_waiting_saves(self):
+        if self.save_waiting:
+            job, key = self.save_waiting
+            if not self.save_queue.submit(job, blocking=False): return
+            self.save_waiting = None
+            self.on_save_submitted(job, key)
+        if self.retry_waiting: self.retry_failed_saves()
+
+    # === 预测性放大 ===
+    # 视图停下 (settle) 或裁剪参数变了 (换图/旋转/比例/框大小/AI 开关) 时调用，只重新计时；
+    # AI_SPECULATE_DELAY_MS 内没有新变化才在 start_speculation 里算一次保存参数
+    def schedule_speculation(self):
+        if not config.AI_SPECULATE: return
+        if self._spec_job: self.root.after_cancel(self._spec_job)
+        self._spec_job = self.root.after(config.AI_SPECULATE_DELAY_MS, self.start_speculation)
+
+    def start_speculation(self):
+        self._spec_job = None
+        key = None
+        if self.pyramid and self.image_list and self.current_index < len(self.image_list):
+            crop_box, plan = self.save_params()
+            key = self.speculation_key(crop_box, plan)
+        if self.spec and self.spec[0] == key: return
+        self.discard_speculation()
+        if key is None: return
+        job = self.make_save_job(crop_box, plan)
+        job.cancel = threading.Event()
+        self.spec = (key, job, self.spec_pool.submit(self.run_speculation, job))
+        self.spec_stats["started"] += 1
+
+    def run_speculation(self, job):
+        t = time.perf_counter()
+        try: return self.run_save_task(job)
+        finally: job.elapsed = time.perf_counter() - t
+
+    # 作废当前的预测任务：还没开始的直接取消，已经在算的通知它尽快停下，花掉的时间记为浪费
+    def discard_speculation(self):
+        if not self.spec: return
+        _, job, fut = self.spec
+        self.spec = None
+        job.cancel.set()
+        if fut.cancel(): return
+        fut.add_done_callback(lambda f: self.root.after(0, lambda: self.count_wasted(job)))
+
+    def count_wasted(self, job):
+        self.spec_stats["wasted"] += 1
+        self.spec_stats["wasted_sec"] += getattr(job, "elapsed", 0.0)
+
+    def speculation_stats(self):
+        st = dict(self.spec_stats)
+        st["hit_rate"] = st["hits"] / st["started"] if st["started"] else 0.0
+        return st
+
+    # 工作线程：只使用任务快照，不读界面状态
+    def run_save_task(self, job):
+        # 预测性放大已经算好 (或正在算) 同样参数的结果
+        if job.speculative is not None:
+            try: img = job.speculative.result()
+            except Exception as e: img = None; print(f"[Speculate] failed, redoing: {e}")
+            if img is not None: return img
+        # 裁剪框是旋转后的原图坐标，直接在全分辨率原图上裁
+        crop = crop_rotated(job.load_source(), job.rotation, job.crop_box)
+        if job.target_size:
+            target_w, target_h = job.target_size
+            if job.plan:
+                upscaler = get_upscaler(job.plan.model.path)
+                if upscaler and upscaler.is_ready:
+                    if job.plan.pre_size: crop = crop.resize(job.plan.pre_size, Image.Resampling.LANCZOS)
+                    high_res = upscaler.process(crop, tile=job.plan.tile, cancel=job.cancel)
+                    if high_res is None: return None   # 预测任务被作废
+                    crop = high_res.resize((target_w, target_h), Image.Resampling.LANCZOS)
+                    print("[Info] AI Upscale Success")
+                else:
+                    crop = crop.resize((target_w, target_h), Image.Resampling.LANCZOS)
+            else:
+                crop = crop.resize((target_w, target_h), Image.Resampling.LANCZOS)
+        return crop
+
+    def on_save_update(self, job):
+        if job.status in ("done", "failed"): self.submit_waiting_saves()
+        active, failed, done = self.save_queue.counts()
+        if failed:
+            names = ", ".join(j.name for j in self.save_queue.failed()[:3])
+            self.l_queue.config(text=f"❌ {failed} 张保存失败 (点击重试): {names}", fg="#FF5555", cursor="hand2")
+        elif self.save_waiting:
+            self.l_queue.config(text="⏳ 保存队列已满，有空位后自动保存并翻页", fg="#FFB74D", cursor="")
+        elif active:
+            self.l_queue.config(text=f"⏳ 后台保存中: {active} 张 | 已完成 {done}", fg="#FFB74D", cursor="")
+        else:
+            self.l_queue.config(text=f"✔ 已保存 {done} 张", fg=config.COLOR_TEXT_SUB, cursor="")
+        # 刚保存完的正好是当前这张 (比如按了返回)，刷新结果预览
+        if job.status == "done" and self.image_list and self.current_index < len(self.image_list):
+            if self.image_list[self.current_index] == job.name: self.refresh_preview_area()
+
+    def retry_failed_saves(self):
+        self.retry_waiting = False
+        for job in self.save_queue.failed():
+            if not self.save_queue.retry(job, blocking=False):
+                # 队列满：block 模式等有空位接着重试剩下的，reject 模式让用户稍后再点
+                self.retry_waiting = self.save_queue.policy == "block"
+                if not self.retry_waiting: self.l_queue.config(text="⚠️ 保存队列已满，请稍候再重试", fg="#FF5555")
+                break
 
     def trash(self):
         if not self.image_list or self.current_index >= len(self.image_list): return
@@ -663,7 +1036,8 @@ class MaskCropper:
         src = os.path.join(self.curr_in, fname)
         dst = os.path.join(self.curr_trash, fname)
         try:
-            shutil.move(src, dst)
+            self.move_own(src, dst, removed=[fname])
+            self.prefetcher.invalidate(src)
             save_p = os.path.join(self.curr_out, os.path.splitext(fname)[0]+".jpg")
             if os.path.exists(save_p): shutil.move(save_p, os.path.join(config.SAVE_TRASH_ROOT, os.path.splitext(fname)[0]+".jpg"))
             self.last_deleted_info = {"name": fname, "src": src, "dst": dst, "idx": self.current_index}
@@ -678,7 +1052,7 @@ class MaskCropper:
         if not self.last_deleted_info: return
         i = self.last_deleted_info
         if os.path.exists(i['dst']):
-            shutil.move(i['dst'], i['src'])
+            self.move_own(i['dst'], i['src'], added=[i['name']])
             save_name = os.path.splitext(i['name'])[0]+".jpg"
             save_trash = os.path.join(config.SAVE_TRASH_ROOT, save_name)
             save_real = os.path.join(self.curr_out, save_name)
@@ -691,8 +1065,96 @@ class MaskCropper:
     def open_trash(self):
         viewer = TrashWindow(self.root, self.curr_trash, self.curr_in, self.curr_out, config.SAVE_TRASH_ROOT, self.restore_callback)
         viewer.open()
-    def restore_callback(self, filename):
-        self.image_list.append(filename); self.image_list.sort(); self.reload_images()
+    # 回收站每批恢复完成后调用一次：把文件名插进列表，不重新扫描目录，当前这张图保持不动
+    # input_dir: 文件恢复到的目录；回收站打开后切换过文件夹的话，恢复的文件不属于当前列表
+    def restore_callback(self, filenames, input_dir):
+        if input_dir != self.curr_in:
+            print(f"[Info] Restored {len(filenames)} file(s) into {input_dir}, not the current folder")
+            return
+        current = self.image_list[self.current_index] if self.current_index < len(self.image_list) else None
+        known = set(self.image_list)
+        for f in sorted(filenames):
+            self.prefetcher.invalidate(os.path.join(self.curr_in, f))
+            if f not in known: bisect.insort(self.image_list, f)
+        if current is None:
+            self.current_index = 0; self.load_image()
+            return
+        self.current_index = self.image_list.index(current)
+        self.l_prog.config(text=f"{self.current_index+1} / {len(self.image_list)}")
+        self.prefetcher.schedule(self.curr_in, self.image_list, self.current_index)
+
+    # === 目录监视 ===
+    def start_watcher(self, disk_files):
+        if not config.WATCH_DIRS: return
+        if self.watcher and self.watcher.folder == self.curr_in: return
+        if self.watcher: self.watcher.stop()
+        self.watcher = None
+        if not os.path.isdir(self.curr_in): return
+        folder = self.curr_in
+        self.watcher = DirWatcher(folder, lambda a, r: self.root.after(0, lambda: self.on_dir_change(folder, a, r)), known=disk_files)
+
+    # 程序自己移动输入目录里的文件：告诉监视器不当成外部变化 (轮询模式也不用因此重扫目录)
+    def move_own(self, src, dst, added=(), removed=()):
+        if self.watcher and self.watcher.folder == self.curr_in: self.watcher.own_move(lambda: shutil.move(src, dst), added, removed)
+        else: shutil.move(src, dst)
+
+    # 增删合并进列表：当前这张图保持不动 (被外部删掉时才换成它后面的那张)
+    def on_dir_change(self, folder, added, removed):
+        if folder != self.curr_in: return
+        old = self.image_list
+        current = old[self.current_index] if self.current_index < len(old) else None
+        if removed:
+            self.image_list = [f for f in old if f not in removed]
+            self.new_files = [f for f in self.new_files if f not in removed]
+            for f in removed: self.prefetcher.invalidate(os.path.join(folder, f))
+        # 自己恢复/撤销回来的文件已经在列表里，不算新图
+        known = set(self.image_list)
+        fresh = sorted(f for f in added if f not in known)
+        for f in fresh: bisect.insort(self.image_list, f)
+        if fresh: print(f"[Watch] {len(fresh)} new, {len(removed)} removed in {os.path.basename(folder) or folder}")
+        self.note_new_files(fresh)
+        if current is not None and current not in removed:
+            self.current_index = self.image_list.index(current)
+            self.l_prog.config(text=f"{self.current_index+1} / {len(self.image_list)}")
+            self.prefetcher.schedule(folder, self.image_list, self.current_index)
+            return
+        nxt = next((f for f in old[self.current_index:] if f not in removed), None) if current else None
+        self.current_index = self.image_list.index(nxt) if nxt else max(0, len(self.image_list) - 1)
+        if self.image_list: self.load_image()
+        else: self.reset_canvas()
+
+    # names 为 None 时清空提示
+    def note_new_files(self, names):
+        if names is None: self.new_files = []
+        else: self.new_files += names
+        if self.new_files: self.l_new.config(text=f"🆕 发现 {len(self.new_files)} 张新图 (点击跳转)")
+        else: self.l_new.config(text="")
+
+    def jump_to_new(self):
+        if not self.new_files: return
+        pos = {f: i for i, f in enumerate(self.image_list)}
+        targets = [pos[f] for f in self.new_files if f in pos]
+        self.note_new_files(None)
+        if not targets: return
+        self.current_index = min(targets)
+        self.load_image()
+
+    # 上次回收站批量操作中途退出：启动时先让用户选择继续完成还是撤销，再读取图片列表
+    def resolve_file_ops(self):
+        ops = get_file_ops()
+        for batch in ops.pending():
+            what = "恢复" if batch.kind == "restore" else "删除"
+            if batch.committed:
+                ops.run_sync(batch)
+                continue
+            ans = messagebox.askyesnocancel("未完成的操作",
+                f"上次批量{what} {batch.total} 张图片时中断 (已完成 {len(batch.succeeded())} 张)。\n\n"
+                f"是：继续完成\n否：撤销已完成的部分\n取消：下次启动再问")
+            if ans is None: continue
+            if ans: batch = ops.run_sync(batch)
+            else: ops.rollback(batch)
+            if batch.error: continue   # run_sync 已经打印了原因，日志留到下次
+            print(f"[Info] Interrupted {batch.kind} batch {batch.id} {'resumed' if ans else 'rolled back'}")
     def show_help(self):
         
         # 创建一个独立的帮助窗口
@@ -865,22 +1327,35 @@ class MaskCropper:
         save_name = os.path.splitext(filename)[0] + ".jpg"
         save_path = os.path.join(self.curr_out, save_name)
         if os.path.exists(save_path):
-            try: self.current_preview_pil = Image.open(save_path); self.update_preview_widget()
-            except: self.clear_preview()
+            # 结果图可能是 AI 放大后的大图：右侧预览只用缓存的缩略图，没有就后台生成
+            box = (config.THUMB_PREVIEW_BOX, config.THUMB_PREVIEW_BOX)
+            self.preview_path = save_path
+            thumb = get_thumb_cache().get(save_path, box)
+            if thumb is not None: self.on_preview_thumb(save_path, thumb); return
+            self.current_preview_pil = None; self.l_preview_img.config(image="", text="…")
+            get_thumb_cache().request(save_path, box, lambda p, t: self.root.after(0, lambda: self.on_preview_thumb(p, t)))
         else: self.clear_preview()
     
+    def on_preview_thumb(self, path, thumb):
+        if path != self.preview_path: return
+        if thumb is None: self.clear_preview(); return
+        self.current_preview_pil = thumb.image; self.update_preview_widget()
+    
     def clear_preview(self):
-        self.current_preview_pil = None; self.l_preview_img.config(image="", text="尚未保存"); self.preview_tk_img = None
+        self.preview_path = None
+        self.current_preview_pil = None; self.l_preview_img.config(image="", text="尚未保存")
     
     def on_preview_resize(self, event): self.update_preview_widget()
     
     def update_preview_widget(self):
-        if not self.current_preview_pil: self.l_preview_img.config(image="", text="尚未保存"); return
+        if not self.current_preview_pil:
+            if not self.preview_path: self.l_preview_img.config(image="", text="尚未保存")
+            return
         w = self.preview_frame.winfo_width(); h = self.preview_frame.winfo_height()
         if w < 10 or h < 10: return 
         try:
             img = self.current_preview_pil.copy()
             img.thumbnail((w-10, h-10), Image.Resampling.BILINEAR)
-            self.preview_tk_img = ImageTk.PhotoImage(img)
-            self.l_preview_img.config(image=self.preview_tk_img, text="")
+            self.preview_buffer.show(img)
+            self.l_preview_img.config(image=self.preview_buffer.photo, text="")
         except: pass
\ No newline at end of file
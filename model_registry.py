@@ -0,0 +1,113 @@
+import os
+import re
+import json
+import config
+
+
+# === AI 模型登记表 ===
+# 扫描 AI_MODELS_DIR 下的 *.onnx (外加旧版放在程序目录的 4x-UltraSharp.onnx)。
+# 每个模型可以有同名 .json 描述文件，例如 models/2x-Foo.json:
+#   {"name": "Foo 2x", "scale": 2, "sec_per_mpix": 12.0, "tile": 512, "mem_mb": 300}
+# 没有描述文件时放大倍数从文件名猜 (4x-xxx / xxx_x2)，其余用 config 的默认值。
+# 同目录下的 <模型名>.fp16.onnx / <模型名>.int8.onnx 是该模型的低精度版本 (python quantize.py make 生成)，
+# 不单独登记，按 config.AI_PRECISION 选用，没有对应版本时用原模型。
+# 这里只读文件和 json，不导入 onnxruntime，界面线程可以随时调用
+PRECISIONS = ("fp32", "fp16", "int8")
+_VARIANT = re.compile(r'\.(fp16|int8)\.onnx$', re.I)
+
+
+def variant_path(path, precision):
+    if precision == "fp32": return path
+    return f"{os.path.splitext(path)[0]}.{precision}.onnx"
+
+
+class ModelInfo:
+    def __init__(self, path, meta=None):
+        meta = meta or {}
+        self.path = path
+        base = os.path.splitext(os.path.basename(path))[0]
+        self.name = meta.get("name", base)
+        m = re.search(r'(\d+)x|x(\d+)', base, re.I)
+        self.scale = int(meta.get("scale", int(m.group(1) or m.group(2)) if m else 4))
+        # 默认耗时按 4x 模型标定的 AI_SEC_PER_MPIX、以输出像素数折算
+        self.sec_per_mpix = float(meta.get("sec_per_mpix", config.AI_SEC_PER_MPIX * (self.scale / 4) ** 2))
+        self.tile = int(meta.get("tile", config.AI_TILE_SIZE))
+        # 加载后大约占用的内存 (权重 + 优化图 + 推理内存池)，用于控制同时加载的模型数
+        self.mem_mb = float(meta.get("mem_mb", os.path.getsize(path) / (1024 * 1024) * 4 + 64))
+        self.variants = {p: variant_path(path, p) for p in PRECISIONS if os.path.exists(variant_path(path, p))}
+
+    # 实际使用的精度：配置的精度有对应文件就用，否则退回 fp32
+    @property
+    def precision(self):
+        return config.AI_PRECISION if config.AI_PRECISION in self.variants else "fp32"
+
+    @property
+    def session_path(self):
+        return self.variants.get(self.precision, self.path)
+
+    def __repr__(self):
+        return f"ModelInfo({self.name!r}, {self.scale}x)"
+
+
+def _meta_path(path):
+    return os.path.splitext(path)[0] + ".json"
+
+
+def _load_meta(path):
+    meta_path = _meta_path(path)
+    if not os.path.exists(meta_path): return {}
+    try:
+        with open(meta_path, encoding='utf-8') as f: return json.load(f)
+    except Exception as e:
+        print(f"[Warn] Bad model metadata {meta_path}: {e}")
+        return {}
+
+
+class ModelRegistry:
+    def __init__(self, models_dir, extra=()):
+        self.models_dir = models_dir
+        self.extra = list(extra)
+        self._stamp = None
+        self._models = []
+
+    # 目录、单独登记的文件或任何 .json 描述文件有变化才重新扫描
+    # (原地改写 json 不会改变目录的 mtime，所以描述文件要单独看)
+    def _current_stamp(self):
+        paths = [self.models_dir] + self.extra + [_meta_path(p) for p in self.extra]
+        stamp = [os.stat(p).st_mtime_ns if os.path.exists(p) else None for p in paths]
+        if os.path.isdir(self.models_dir):
+            with os.scandir(self.models_dir) as it:
+                stamp += sorted((e.name, e.stat().st_mtime_ns) for e in it if e.name.lower().endswith(".json"))
+        return tuple(stamp)
+
+    def models(self):
+        stamp = self._current_stamp()
+        if stamp != self._stamp:
+            self._models = self._scan()
+            self._stamp = stamp
+        return self._models
+
+    def _scan(self):
+        paths = []
+        if os.path.isdir(self.models_dir):
+            for f in sorted(os.listdir(self.models_dir)):
+                # *.opt-*.onnx 是 onnxruntime 优化缓存，*.fp16/int8.onnx 是低精度版本，都不单独登记
+                if f.lower().endswith(".onnx") and ".opt-" not in f and not _VARIANT.search(f):
+                    paths.append(os.path.join(self.models_dir, f))
+        paths += [p for p in self.extra if os.path.exists(p)]
+        models = []
+        for p in paths:
+            try: models.append(ModelInfo(p, _load_meta(p)))
+            except Exception as e: print(f"[Warn] Skipping model {p}: {e}")
+        return models
+
+    def find(self, path):
+        return next((m for m in self.models() if m.path == path), None)
+
+    # 不指定模型时 (预热等) 用放大倍数最大的那个
+    def default(self):
+        models = self.models()
+        return max(models, key=lambda m: m.scale) if models else None
+
+
+registry = ModelRegistry(config.AI_MODELS_DIR, [config.AI_LEGACY_MODEL])
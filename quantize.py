@@ -0,0 +1,184 @@
+import os
+import time
+import tempfile
+import multiprocessing as mp
+import numpy as np
+from PIL import Image
+from onnxruntime.quantization import CalibrationDataReader
+import config
+from model_registry import PRECISIONS, variant_path
+
+
+# === 低精度模型工具 ===
+# python quantize.py make <模型.onnx> --calib <裁剪图目录> [--mode static|dynamic|fp16]
+#   生成 <模型名>.int8.onnx (static/dynamic) 或 <模型名>.fp16.onnx，放在原模型旁边
+# python quantize.py compare <模型.onnx> --calib <裁剪图目录>
+#   对比各精度版本相对 fp32 的 PSNR / SSIM、单张耗时和峰值内存
+# 生成好以后在 config.py 里把 AI_PRECISION 改成 "int8" / "fp16" 即可切换
+IMAGE_EXTS = ('.jpg', '.jpeg', '.png', '.webp', '.bmp')
+
+
+def _calib_images(folder, limit):
+    files = sorted(f for f in os.listdir(folder) if f.lower().endswith(IMAGE_EXTS))
+    if not files: raise SystemExit(f"[Error] No images in {folder}")
+    # 均匀抽样，目录很大时也只读 limit 张
+    step = max(1, len(files) // limit)
+    return [os.path.join(folder, f) for f in files[::step][:limit]]
+
+
+# 每张图取中心一块 size x size (不够大就整张)，和推理时的分块差不多大
+def _center_crop(path, size):
+    img = Image.open(path).convert('RGB')
+    w, h = img.size
+    cw, ch = min(w, size), min(h, size)
+    x, y = (w - cw) // 2, (h - ch) // 2
+    return img.crop((x, y, x + cw, y + ch))
+
+
+class _CalibReader(CalibrationDataReader):
+    def __init__(self, input_name, paths, size):
+        self.input_name = input_name
+        self.all_paths = list(paths)
+        self.paths = list(paths)
+        self.size = size
+
+    # 每次返回一个输入字典，读完返回 None
+    def get_next(self):
+        if not self.paths: return None
+        img = np.asarray(_center_crop(self.paths.pop(0), self.size), np.float32) / 255.0
+        return {self.input_name: img.transpose((2, 0, 1))[None]}
+
+    # 校准方法需要多遍读数据时从头再来
+    def rewind(self):
+        self.paths = list(self.all_paths)
+
+
+def make(args):
+    import onnx
+    from onnxruntime.quantization import quantize_static, quantize_dynamic, QuantFormat, QuantType
+
+    precision = "fp16" if args.mode == "fp16" else "int8"
+    out = variant_path(args.model, precision)
+    t = time.perf_counter()
+    if args.mode == "fp16":
+        from onnxruntime.transformers.float16 import convert_float_to_float16
+        # 输入输出保持 float32，推理缓冲和 IO binding 不用改
+        model = convert_float_to_float16(onnx.load(args.model), keep_io_types=True)
+        onnx.save(model, out)
+    elif args.mode == "dynamic":
+        quantize_dynamic(args.model, out, weight_type=QuantType.QInt8)
+    else:
+        input_name = onnx.load(args.model, load_external_data=False).graph.input[0].name
+        reader = _CalibReader(input_name, _calib_images(args.calib, args.samples), args.size)
+        quantize_static(args.model, out, reader, quant_format=QuantFormat.QDQ, per_channel=True,
+                        activation_type=QuantType.QUInt8, weight_type=QuantType.QInt8)
+    print(f"[OK] {args.mode} model written: {out} ({os.path.getsize(out) / 1024 / 1024:.1f} MB, {time.perf_counter() - t:.1f}s)")
+
+
+# === 画质指标 (uint8 RGB) ===
+def psnr(a, b):
+    mse = np.mean((a.astype(np.float64) - b.astype(np.float64)) ** 2)
+    return float('inf') if mse == 0 else 10 * np.log10(255.0 ** 2 / mse)
+
+
+def _gauss_blur(x, sigma=1.5, radius=5):
+    k = np.exp(-0.5 * (np.arange(-radius, radius + 1) / sigma) ** 2)
+    k /= k.sum()
+    h, w = x.shape
+    # 可分离卷积，只保留完整窗口 (valid) 区域
+    rows = sum(k[i] * x[:, i:w - 2 * radius + i] for i in range(len(k)))
+    return sum(k[i] * rows[i:h - 2 * radius + i] for i in range(len(k)))
+
+
+# 亮度通道上的 SSIM (11x11 高斯窗，sigma 1.5)
+def ssim(a, b):
+    def luma(img):
+        img = img.astype(np.float64)
+        return img[..., 0] * 0.299 + img[..., 1] * 0.587 + img[..., 2] * 0.114
+    x, y = luma(a), luma(b)
+    c1, c2 = (0.01 * 255) ** 2, (0.03 * 255) ** 2
+    mx, my = _gauss_blur(x), _gauss_blur(y)
+    sxx = _gauss_blur(x * x) - mx * mx
+    syy = _gauss_blur(y * y) - my * my
+    sxy = _gauss_blur(x * y) - mx * my
+    m = ((2 * mx * my + c1) * (2 * sxy + c2)) / ((mx * mx + my * my + c1) * (sxx + syy + c2))
+    return float(m.mean())
+
+
+# 在独立进程里跑一个精度版本，峰值内存互不影响。结果图存成 png 交给父进程对比
+def _run_variant(path, images, out_dir, tag, tile):
+    from upscaler import AIUpscaler, _peak_rss_mb
+    up = AIUpscaler(path)
+    if not up.is_ready: return None
+    up.warmup()
+    times = []
+    for i, img in enumerate(images):
+        t = time.perf_counter()
+        res = up.process(img, tile=tile)
+        times.append((time.perf_counter() - t) * 1000)
+        res.save(os.path.join(out_dir, f"{tag}_{i}.png"))
+    return sorted(times)[len(times) // 2], _peak_rss_mb()
+
+
+def compare(args):
+    # fp32 是画质参照，必须第一个跑
+    variants = [("fp32", args.model)] + [(p, variant_path(args.model, p)) for p in PRECISIONS
+                                          if p != "fp32" and os.path.exists(variant_path(args.model, p))]
+    images = [_center_crop(p, args.size) for p in _calib_images(args.calib, args.samples)]
+    ctx = mp.get_context("spawn")
+    lines = [f"{'precision':<10}{'PSNR dB':>9}{'SSIM':>8}{'ms/img':>9}{'peak RSS MB':>13}{'file MB':>9}"]
+    has_ref = False
+    with tempfile.TemporaryDirectory() as tmp:
+        for precision, path in variants:
+            result = None
+            if os.path.exists(path):
+                with ctx.Pool(1) as pool:
+                    result = pool.apply(_run_variant, (path, images, tmp, precision, args.tile))
+            if result is None:
+                lines.append(f"{precision:<10}  failed to load")
+                if precision == "fp32":
+                    print(f"[Error] fp32 reference {path} could not be loaded, PSNR/SSIM will not be computed")
+                continue
+            ms, rss = result
+            if precision == "fp32":
+                has_ref = True
+                q_psnr, q_ssim = "ref", "ref"
+            elif not has_ref:
+                q_psnr, q_ssim = "no ref", "no ref"
+            else:
+                pairs = [(np.asarray(Image.open(os.path.join(tmp, f"fp32_{i}.png"))),
+                          np.asarray(Image.open(os.path.join(tmp, f"{precision}_{i}.png")))) for i in range(len(images))]
+                q_psnr = f"{np.mean([psnr(a, b) for a, b in pairs]):.2f}"
+                q_ssim = f"{np.mean([ssim(a, b) for a, b in pairs]):.4f}"
+            lines.append(f"{precision:<10}{q_psnr:>9}{q_ssim:>8}{ms:>9.1f}{'n/a' if rss is None else f'{rss:.0f}':>13}"
+                         f"{os.path.getsize(path) / 1024 / 1024:>9.1f}")
+    report = "\n".join(lines)
+    print(report)
+    if args.report:
+        with open(args.report, 'w', encoding='utf-8') as f:
+            f.write(f"model: {args.model}\nimages: {len(images)} x {args.size}px crops from {args.calib}\n\n{report}\n")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="SmartCropper quantized model tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("make", help="write an int8 / fp16 copy of a model next to it")
+    p.add_argument("model")
+    p.add_argument("--calib", help="folder of crops used to calibrate static int8 quantization")
+    p.add_argument("--mode", choices=("static", "dynamic", "fp16"), default="static")
+    p.add_argument("--samples", type=int, default=32)
+    p.add_argument("--size", type=int, default=128, help="calibration crop size")
+    p.set_defaults(func=make)
+    p = sub.add_parser("compare", help="PSNR/SSIM vs fp32, latency and peak memory of every precision")
+    p.add_argument("model")
+    p.add_argument("--calib", required=True)
+    p.add_argument("--samples", type=int, default=8)
+    p.add_argument("--size", type=int, default=256, help="test crop size")
+    p.add_argument("--tile", type=int, default=config.AI_TILE_SIZE)
+    p.add_argument("--report", help="also write the table to this file")
+    p.set_defaults(func=compare)
+    args = parser.parse_args()
+    if args.cmd == "make" and args.mode == "static" and not args.calib:
+        parser.error("--calib is required for static quantization")
+    args.func(args)
@@ -0,0 +1,202 @@
+import math
+import threading
+from collections import OrderedDict
+from PIL import Image, ImageTk
+from image_cache import crop_rotated, image_nbytes
+
+# 重采样算法的画质等级，缓存里高画质的瓦片可以顶替低画质的请求
+QUALITY = {
+    Image.Resampling.NEAREST: 0,
+    Image.Resampling.BILINEAR: 1,
+    Image.Resampling.BICUBIC: 2,
+    Image.Resampling.LANCZOS: 3,
+}
+
+
+# === 多级金字塔 (mipmap) ===
+# levels[0] 是当前显示源图 (代理图或原图，未旋转)，之后每级宽高减半，后台逐级生成。
+# density = 该级像素 / 原图像素；绘制时取 density >= scale 的最粗一级，
+# 每帧的重采样量只和画布大小有关，和原图多大无关。
+# 旋转不需要重建任何一级：只把可见区域那一小块转过来 (见 crop_rotated)
+class ImagePyramid:
+    def __init__(self, base, full_size, min_side=256):
+        self.full_w, self.full_h = full_size
+        self.min_side = min_side
+        self.levels = [base]
+        self._lock = threading.Lock()
+        self._cancel = threading.Event()
+        self._start(())
+
+    @property
+    def base(self):
+        return self.levels[0]
+
+    @property
+    def nbytes(self):
+        return sum(image_nbytes(lv) for lv in self.levels)
+
+    # 除 base 外金字塔额外占用的内存
+    @property
+    def extra_nbytes(self):
+        return sum(image_nbytes(lv) for lv in self.levels[1:])
+
+    def density(self, img):
+        return img.width / self.full_w
+
+    def _start(self, reuse):
+        cancel = self._cancel
+        threading.Thread(target=self._run, args=(cancel, list(reuse)), daemon=True).start()
+
+    def _run(self, cancel, reuse):
+        while not cancel.is_set():
+            last = self.levels[-1]
+            # 再往下就和旧层级重叠了，直接接上旧的
+            if reuse and self.density(last) / 2 <= self.density(reuse[0]) * 1.01:
+                with self._lock:
+                    if cancel.is_set(): return
+                    self.levels = self.levels + reuse
+                reuse = []
+                continue
+            if min(last.size) < self.min_side * 2: return
+            nxt = last.reduce(2)
+            with self._lock:
+                if cancel.is_set(): return
+                self.levels = self.levels + [nxt]
+
+    # 换成更清晰的源图 (代理图 -> 原图)：只补 base 到旧 base 之间缺的几级
+    def set_base(self, base):
+        self.cancel()
+        with self._lock:
+            reuse = [lv for lv in self.levels if self.density(lv) < self.density(base)]
+            self.levels = [base]
+            self._cancel = threading.Event()
+        self._start(reuse)
+
+    def cancel(self):
+        self._cancel.set()
+
+    def pick(self, scale):
+        levels = self.levels
+        best = levels[0]
+        for lv in levels[1:]:
+            if self.density(lv) < scale: break
+            best = lv
+        return best
+
+    # box: 旋转后原图坐标 (浮点)；size: 输出像素尺寸
+    def render(self, rotation, box, size, resample):
+        x1, y1, x2, y2 = box
+        level = self.pick(size[0] / max(1e-6, x2 - x1))
+        lw, lh = level.size
+        if rotation in (90, 270):
+            rw, rh = lh, lw; fx, fy = lh / self.full_h, lw / self.full_w
+        else:
+            rw, rh = lw, lh; fx, fy = lw / self.full_w, lh / self.full_h
+        b = (min(max(0, x1 * fx), rw), min(max(0, y1 * fy), rh),
+             min(max(0, x2 * fx), rw), min(max(0, y2 * fy), rh))
+        # 多裁一圈，让滤波核能采到框外的像素，瓦片拼接处才不会有接缝
+        m = math.ceil(3 * max(1.0, (b[2] - b[0]) / size[0])) + 1
+        ib = (max(0, math.floor(b[0]) - m), max(0, math.floor(b[1]) - m),
+              min(rw, math.ceil(b[2]) + m), min(rh, math.ceil(b[3]) + m))
+        part = crop_rotated(level, rotation, ib)
+        return part.resize(size, resample, box=(b[0] - ib[0], b[1] - ib[1], b[2] - ib[0], b[3] - ib[1]))
+
+
+# === 视口瓦片缓存 ===
+# 把缩放后的整张图切成 tile x tile 的格子，键为 (图片/旋转, 缩放, tx, ty)。
+# 平移时只渲染新露出来的格子，其余直接从缓存拼；按 LRU + 内存上限淘汰
+class TileCache:
+    def __init__(self, tile=256, budget_mb=128):
+        self.tile = tile
+        self.budget = int(budget_mb * 1024 * 1024)
+        self._tiles = OrderedDict()   # key -> (img, quality)
+        self.bytes_used = 0
+        self.hits = 0
+        self.misses = 0
+
+    def clear(self):
+        self._tiles.clear()
+        self.bytes_used = 0
+
+    # region: 缩放后图像坐标系里的整数区域 (x1, y1, x2, y2)
+    # min_quality: 缓存里的瓦片画质不低于它就直接用 (拖拽时传 0，什么都能用)
+    def compose(self, pyramid, view_key, rotation, scale, src_size, region, resample, min_quality=None):
+        if min_quality is None: min_quality = QUALITY.get(resample, 0)
+        T = self.tile
+        sw = math.ceil(src_size[0] * scale); sh = math.ceil(src_size[1] * scale)
+        x1, y1, x2, y2 = region
+        qs = round(scale, 6)
+        out = Image.new('RGB', (x2 - x1, y2 - y1))
+        for ty in range(y1 // T, (y2 - 1) // T + 1):
+            for tx in range(x1 // T, (x2 - 1) // T + 1):
+                key = (view_key, rotation, qs, tx, ty)
+                entry = self._tiles.get(key)
+                if entry and entry[1] >= min_quality:
+                    self._tiles.move_to_end(key)
+                    self.hits += 1
+                    tile = entry[0]
+                else:
+                    self.misses += 1
+                    tw = min(T, sw - tx * T); th = min(T, sh - ty * T)
+                    box = (tx * T / scale, ty * T / scale,
+                           min(src_size[0], (tx * T + tw) / scale), min(src_size[1], (ty * T + th) / scale))
+                    tile = pyramid.render(rotation, box, (tw, th), resample)
+                    self._put(key, tile, QUALITY.get(resample, 0))
+                out.paste(tile, (tx * T - x1, ty * T - y1))
+        return out
+
+    def _put(self, key, tile, quality):
+        old = self._tiles.pop(key, None)
+        if old: self.bytes_used -= image_nbytes(old[0])
+        self._tiles[key] = (tile, quality)
+        self.bytes_used += image_nbytes(tile)
+        while self.bytes_used > self.budget and len(self._tiles) > 1:
+            _, (t, _) = self._tiles.popitem(last=False)
+            self.bytes_used -= image_nbytes(t)
+
+
+# === 可复用的 PhotoImage ===
+# 每帧新建 ImageTk.PhotoImage 很贵 (Tk 端要重新分配图片)；尺寸不变时直接把新像素 paste 进去
+class PhotoBuffer:
+    def __init__(self):
+        self.photo = None
+        self.key = None
+        self.created = 0
+        self.pasted = 0
+
+    # 返回 True 表示换了一个新的 PhotoImage 对象，调用方需要重新绑定到控件上
+    def show(self, img):
+        key = (img.size, img.mode)
+        if self.photo is None or key != self.key:
+            self.photo = ImageTk.PhotoImage(img)
+            self.key = key
+            self.created += 1
+            return True
+        self.photo.paste(img)
+        self.pasted += 1
+        return False
+
+
+# 一批同时显示的小图 (缩略图网格)：不再显示的 PhotoImage 按尺寸回收，下次同尺寸的图直接 paste 进去
+class PhotoPool:
+    def __init__(self):
+        self._free = {}
+        self._used = {}     # photo -> (尺寸, 模式)
+
+    def release(self, photo):
+        key = self._used.pop(photo, None)
+        if key: self._free.setdefault(key, []).append(photo)
+
+    def recycle(self):
+        for photo in list(self._used): self.release(photo)
+
+    def get(self, img):
+        key = (img.size, img.mode)
+        free = self._free.get(key)
+        if free:
+            photo = free.pop()
+            photo.paste(img)
+        else:
+            photo = ImageTk.PhotoImage(img)
+        self._used[photo] = key
+        return photo
@@ -1,7 +1,15 @@
-import tkinter as tk
-from main_ui import MaskCropper
+import time
+T0 = time.perf_counter()   # 启动耗时的起点，放在最前面
+import timing
+import multiprocessing
+timing.start(T0)
 
 if __name__ == "__main__":
+    # 打包成 exe 后 AI 子进程也从这个入口启动
+    multiprocessing.freeze_support()
+    import tkinter as tk
+    from main_ui import MaskCropper
+    timing.mark("imports")
     root = tk.Tk()
     app = MaskCropper(root)
-    root.mainloop()
\ No newline at end of file
+    root.mainloop()
@@ -0,0 +1,122 @@
+import itertools
+import threading
+from concurrent.futures import ThreadPoolExecutor, Future
+from PIL import Image
+
+
+# === 保存任务：按下保存那一刻的完整快照，之后翻页/旋转都不影响它 ===
+class SaveJob:
+    def __init__(self, name, source, rotation, crop_box, target_size, plan, out_path, path=None):
+        self.name = name                # 原图文件名 (用于界面显示)
+        self.source = source            # 全分辨率原图: PIL 图 / 正在解码的 Future / 文件路径
+        self.path = path                # 原图路径，Future 被取消或解码失败时从这里重新解码
+        self.rotation = rotation
+        self.crop_box = crop_box        # 旋转后原图坐标
+        self.target_size = target_size  # 锁定输出尺寸，None 表示按裁剪原尺寸
+        self.plan = plan                # UpscalePlan，None 表示不走 AI
+        self.out_path = out_path
+        self.speculative = None         # 预测性放大的结果 (Future)，裁剪参数完全一致时直接用
+        self.cancel = None              # threading.Event，预测性任务作废时置位
+        self.seq = 0
+        self.status = "pending"         # pending / running / done / failed
+        self.error = None
+
+    def load_source(self):
+        src = self.source
+        if isinstance(src, Future):
+            try: src = src.result()
+            except Exception as e:      # 包括 CancelledError
+                if not self.path: raise
+                print(f"[Warn] Background decode unavailable for {self.name} ({e!r}), decoding from file")
+                src = self.path
+        if isinstance(src, str): src = Image.open(src).convert('RGB')
+        # 解码结果留在任务上，重试时不用再解一次
+        self.source = src
+        return src
+
+
+# === 有序、有界的后台保存队列 ===
+# process(job) 负责裁剪/放大并返回最终图像 (在工作线程执行)，写盘由队列负责。
+# ordered=True 时计算并行、写盘严格按提交顺序 (同一张图连续保存两次，后一次一定覆盖前一次)。
+# max_pending 为同时排队的任务上限，满了以后 policy="block" 等待空位，"reject" 直接拒绝。
+# 界面线程不能等：传 blocking=False 立即返回 False，由调用方在 on_update 里有空位时再提交
+class SaveQueue:
+    def __init__(self, process, workers=2, max_pending=8, ordered=True, policy="block", on_update=None):
+        self.process = process
+        self.ordered = ordered
+        self.policy = policy
+        self.on_update = on_update      # 任务状态变化回调 (工作线程中调用)
+        self._pool = ThreadPoolExecutor(max_workers=max(1, workers), thread_name_prefix="save")
+        self._slots = threading.BoundedSemaphore(max(1, max_pending))
+        self._seq = itertools.count(1)
+        self._turn = threading.Condition()
+        self._next_write = 1
+        self._lock = threading.Lock()
+        self.jobs = []                  # 尚未成功的任务 (排队中/进行中/失败)
+        self.done_count = 0
+
+    def submit(self, job, blocking=None):
+        if blocking is None: blocking = self.policy == "block"
+        if not self._slots.acquire(blocking=blocking): return False
+        with self._lock:
+            job.seq = next(self._seq)
+            job.status = "pending"; job.error = None
+            if job not in self.jobs: self.jobs.append(job)
+        self._notify(job)
+        self._pool.submit(self._run, job)
+        return True
+
+    def retry(self, job, blocking=None):
+        if job.status != "failed": return False
+        return self.submit(job, blocking)
+
+    def failed(self):
+        with self._lock: return [j for j in self.jobs if j.status == "failed"]
+
+    def counts(self):
+        with self._lock:
+            active = sum(1 for j in self.jobs if j.status in ("pending", "running"))
+            failed = sum(1 for j in self.jobs if j.status == "failed")
+        return active, failed, self.done_count
+
+    def _run(self, job):
+        job.status = "running"; self._notify(job)
+        img, error = None, None
+        try: img = self.process(job)
+        except Exception as e: error = e
+        try:
+            self._wait_turn(job)
+            if error is None:
+                try: img.save(job.out_path, quality=98, subsampling=0)
+                except Exception as e: error = e
+        finally:
+            self._end_turn(job)
+            self._slots.release()
+        with self._lock:
+            if error is None:
+                job.status = "done"; job.source = None
+                self.jobs.remove(job); self.done_count += 1
+            else:
+                job.status = "failed"; job.error = str(error)
+        if error is None: print(f"Saved: {job.name}")
+        else: print(f"Save Error: {job.name}: {error}")
+        self._notify(job)
+
+    def _wait_turn(self, job):
+        if not self.ordered: return
+        with self._turn:
+            while self._next_write != job.seq: self._turn.wait()
+
+    def _end_turn(self, job):
+        if not self.ordered: return
+        with self._turn:
+            self._next_write = job.seq + 1
+            self._turn.notify_all()
+
+    def _notify(self, job):
+        if self.on_update:
+            try: self.on_update(job)
+            except Exception: pass
+
+    def shutdown(self, wait=True):
+        self._pool.shutdown(wait=wait)
@@ -0,0 +1,254 @@
+import os
+import io
+import time
+import queue
+import sqlite3
+import threading
+import itertools
+from PIL import Image
+import config
+
+
+# === 磁盘缩略图缓存 ===
+# 所有缩略图存在一个 sqlite 文件里 (JPEG 编码)，键 = 绝对路径 + 文件大小 + mtime + 缩略图框，
+# 原图被替换/修改后键自然变了，旧条目没人再读，按最近使用时间淘汰掉。
+# 生成在后台线程池里做：JPEG 用 draft 在 DCT 域直接缩小解码，其他格式 thumbnail 时先 reduce。
+# 可见的请求 (priority 0) 总是先于后台预生成 (priority 1) 处理，
+# 同一优先级里可见请求后来的先做 (滚动时最新露出来的格子最先出图)，预生成按提交顺序做
+
+def make_thumbnail(path, box):
+    img = Image.open(path)
+    src_size = img.size
+    # 和 Image.thumbnail 默认的 reducing_gap=2 一样，draft 到框的两倍以上，再 LANCZOS 缩到框内
+    if img.format == 'JPEG': img.draft('RGB', (box[0] * 2, box[1] * 2))
+    img = img.convert('RGB')
+    img.thumbnail(box, Image.Resampling.LANCZOS)
+    return img, src_size
+
+
+class Thumb:
+    def __init__(self, image, src_size):
+        self.image = image
+        self.src_size = src_size   # 原图尺寸，详情面板直接用，不用再打开原图
+
+
+class ThumbCache:
+    def __init__(self, db_path, max_mb=200, workers=2, quality=85):
+        self.db_path = db_path
+        self.budget = int(max_mb * 1024 * 1024)
+        self.quality = quality
+        self._db = sqlite3.connect(db_path, check_same_thread=False)
+        self._db.execute("PRAGMA journal_mode=WAL")
+        self._db.execute("PRAGMA synchronous=NORMAL")
+        self._db.execute("CREATE TABLE IF NOT EXISTS thumbs (key TEXT PRIMARY KEY, path TEXT, data BLOB,"
+                         " src_w INTEGER, src_h INTEGER, nbytes INTEGER, atime REAL)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS thumbs_atime ON thumbs(atime)")
+        self._db.execute("CREATE INDEX IF NOT EXISTS thumbs_path ON thumbs(path)")
+        self._db.commit()
+        self._lock = threading.Lock()
+        self._touched = {}   # 命中过的 key -> 使用时间，攒着由工作线程一次事务写回 (界面线程读缓存不写库)
+        self.bytes_used = self._db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbs").fetchone()[0]
+
+        self._queue = queue.PriorityQueue()
+        self._seq = itertools.count()
+        self._pending = {}   # key -> 回调列表；cancel() 清空后队列里的旧任务直接跳过
+        self.hits = 0
+        self.generated = 0
+        self.failed = 0
+        self.evicted = 0
+        for i in range(max(1, workers)):
+            threading.Thread(target=self._loop, name=f"thumbs-{i}", daemon=True).start()
+
+    @staticmethod
+    def key(path, box):
+        try:
+            st = os.stat(path)
+        except OSError:
+            return None
+        return f"{os.path.abspath(path)}|{st.st_size}|{st.st_mtime_ns}|{box[0]}x{box[1]}"
+
+    # 只查磁盘缓存，不解码原图：命中返回 Thumb，否则 None
+    def get(self, path, box):
+        key = self.key(path, box)
+        if key is None: return None
+        return self._lookup(key)
+
+    def _lookup(self, key):
+        with self._lock:
+            row = self._db.execute("SELECT data, src_w, src_h FROM thumbs WHERE key=?", (key,)).fetchone()
+            if row is None: return None
+            self._touched[key] = time.time()
+            self.hits += 1
+        img = Image.open(io.BytesIO(row[0]))
+        img.load()
+        return Thumb(img, (row[1], row[2]))
+
+    # 后台生成 (已经在缓存里的也走这里，工作线程读出来交给回调)。
+    # callback(path, thumb) 在工作线程调用，失败时 thumb 为 None；界面要自己 after() 回主线程
+    def request(self, path, box, callback=None, priority=0):
+        key = self.key(path, box)
+        if key is None:
+            if callback: callback(path, None)
+            return
+        with self._lock:
+            waiting = self._pending.get(key)
+            if waiting is not None:
+                if callback: waiting.append(callback)
+                # 已经排在后台预生成里的，变成可见请求时再插一份到前面
+                if priority > 0: return
+            else:
+                self._pending[key] = [callback] if callback else []
+            seq = next(self._seq)
+        self._queue.put((priority, -seq if priority == 0 else seq, key, path, box))
+
+    # 丢掉某个目录下还没开始的任务 (回收站窗口关闭时调用)，不传目录就全部丢掉
+    def cancel(self, folder=None):
+        with self._lock:
+            if folder is None:
+                self._pending.clear()
+                return
+            prefix = os.path.join(os.path.abspath(folder), "")
+            for key in [k for k in self._pending if k.startswith(prefix)]:
+                del self._pending[key]
+
+    def _loop(self):
+        while True:
+            try:
+                _, _, key, path, box = self._queue.get(timeout=2)
+            except queue.Empty:
+                # 空闲时把攒下的使用时间写回去
+                with self._lock:
+                    if self._touched: self._flush_touched(); self._db.commit()
+                continue
+            with self._lock:
+                if key not in self._pending: continue
+                # 只是预生成 (没人等结果)：已经有缓存就不用读出来解码
+                if not any(self._pending[key]) and self._exists(key):
+                    del self._pending[key]
+                    continue
+            try:
+                thumb = self._lookup(key) or self._generate(key, path, box)
+            except Exception as e:
+                print(f"[Thumbs] failed: {os.path.basename(path)} ({e})")
+                with self._lock: self.failed += 1
+                thumb = None
+            with self._lock: callbacks = self._pending.pop(key, [])
+            for cb in callbacks:
+                if cb: cb(path, thumb)
+
+    def _exists(self, key):
+        return self._db.execute("SELECT 1 FROM thumbs WHERE key=?", (key,)).fetchone() is not None
+
+    def _generate(self, key, path, box):
+        img, src_size = make_thumbnail(path, box)
+        buf = io.BytesIO()
+        img.save(buf, 'JPEG', quality=self.quality)
+        data = buf.getvalue()
+        with self._lock:
+            old = self._db.execute("SELECT nbytes FROM thumbs WHERE key=?", (key,)).fetchone()
+            if old: self.bytes_used -= old[0]
+            self._db.execute("INSERT OR REPLACE INTO thumbs VALUES (?, ?, ?, ?, ?, ?, ?)",
+                             (key, os.path.abspath(path), data, src_size[0], src_size[1], len(data), time.time()))
+            self.bytes_used += len(data)
+            self.generated += 1
+            # 使用时间先写回，淘汰时才不会把刚看过的删掉；和插入同一个事务提交
+            self._flush_touched()
+            if self.bytes_used > self.budget: self._evict()
+            self._db.commit()
+        return Thumb(img, src_size)
+
+    def _flush_touched(self):
+        if not self._touched: return
+        self._db.executemany("UPDATE thumbs SET atime=? WHERE key=?", [(t, k) for k, t in self._touched.items()])
+        self._touched = {}
+
+    # 超出上限时按最近使用时间淘汰到上限的 90%，避免每插一张就删一次
+    def _evict(self):
+        target = self.budget * 0.9
+        while self.bytes_used > target:
+            rows = self._db.execute("SELECT key, nbytes FROM thumbs ORDER BY atime LIMIT 256").fetchall()
+            if not rows: break
+            for key, n in rows:
+                self._db.execute("DELETE FROM thumbs WHERE key=?", (key,))
+                self.bytes_used -= n
+                self.evicted += 1
+                if self.bytes_used <= target: break
+
+    # 文件被永久删除/移走后顺手清掉它们的所有缩略图 (一次提交)
+    def forget(self, *paths):
+        with self._lock:
+            for path in paths:
+                n = self._db.execute("SELECT COALESCE(SUM(nbytes), 0) FROM thumbs WHERE path=?",
+                                     (os.path.abspath(path),)).fetchone()[0]
+                self._db.execute("DELETE FROM thumbs WHERE path=?", (os.path.abspath(path),))
+                self.bytes_used -= n
+            self._db.commit()
+
+    def stats(self):
+        with self._lock:
+            count = self._db.execute("SELECT COUNT(*) FROM thumbs").fetchone()[0]
+            return {"entries": count, "mb": self.bytes_used / (1024 * 1024), "hits": self.hits,
+                    "generated": self.generated, "failed": self.failed, "evicted": self.evicted,
+                    "pending": len(self._pending)}
+
+
+_cache = None
+_cache_lock = threading.Lock()
+
+
+# 主界面和回收站共用一个缓存 (同一个 sqlite 连接和线程池)，第一次用到时才创建
+def get_thumb_cache():
+    global _cache
+    with _cache_lock:
+        if _cache is None:
+            try:
+                _cache = ThumbCache(config.THUMB_CACHE_DB, config.THUMB_CACHE_MB, config.THUMB_WORKERS)
+            except sqlite3.Error as e:
+                print(f"[Error] Thumbnail cache {config.THUMB_CACHE_DB} unavailable ({e}), keeping thumbnails in memory")
+                _cache = ThumbCache(":memory:", config.THUMB_CACHE_MB, config.THUMB_WORKERS)
+        return _cache
+
+
+# python thumb_cache.py bench <图片目录> [--box 130]
+# 用一个临时缓存文件测冷启动 (全部生成) 和热启动 (全部命中) 的速度
+if __name__ == "__main__":
+    import argparse
+    import tempfile
+    parser = argparse.ArgumentParser(description="SmartCropper thumbnail cache tools")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("bench", help="cold vs warm thumbnail throughput on a folder")
+    p.add_argument("folder")
+    p.add_argument("--box", type=int, default=130)
+    p.add_argument("--workers", type=int, default=config.THUMB_WORKERS)
+    p.add_argument("--limit", type=int, default=0)
+    p = sub.add_parser("stats", help="entries and size of the configured cache")
+    args = parser.parse_args()
+
+    if args.cmd == "stats":
+        print(get_thumb_cache().stats())
+        raise SystemExit
+    exts = ('.jpg', '.png', '.jpeg', '.bmp', '.webp')
+    files = sorted(os.path.join(args.folder, f) for f in os.listdir(args.folder) if f.lower().endswith(exts))
+    if args.limit: files = files[:args.limit]
+    box = (args.box, args.box)
+    with tempfile.TemporaryDirectory() as tmp:
+        cache = ThumbCache(os.path.join(tmp, "bench.sqlite"), workers=args.workers)
+        t = time.perf_counter()
+        done = threading.Semaphore(0)
+        for f in files: cache.request(f, box, lambda p, th: done.release(), priority=1)
+        for _ in files: done.acquire()
+        cold = time.perf_counter() - t
+        t = time.perf_counter()
+        hits = sum(cache.get(f, box) is not None for f in files)
+        warm = time.perf_counter() - t
+        # 对照：不用缓存，每次打开窗口都在界面线程里 open + thumbnail (旧的做法)
+        t = time.perf_counter()
+        for f in files[:50]:
+            img = Image.open(f); img.thumbnail(box)
+        full = (time.perf_counter() - t) / min(50, len(files))
+        st = cache.stats()
+        print(f"[Thumbs] {len(files)} images, box {args.box}px, {args.workers} workers")
+        print(f"  no cache (old):      {full * 1000:.1f} ms/img")
+        print(f"  cold (generate):     {cold / len(files) * 1000:.1f} ms/img wall, {len(files) / cold:.0f} img/s")
+        print(f"  warm (cache hits):   {warm / len(files) * 1000:.2f} ms/img, {hits} hits")
+        print(f"  cache size:          {st['mb']:.1f} MB ({st['mb'] * 1024 / max(1, st['entries']):.1f} KB/thumb)")
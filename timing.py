@@ -0,0 +1,22 @@
+import os
+import sys
+import time
+
+# === 启动耗时测量 ===
+# python run.py --timing (或设置环境变量 SMARTCROPPER_TIMING=1) 时打印各阶段距 run.py 开始执行的耗时。
+# 起点由 run.py 第一行取时间后调用 start() 传入；解释器自身启动 (及打包 exe 的解压) 不在内。
+# 没调用 start() 时 (单独导入模块) 以本模块导入时刻为起点
+T0 = time.perf_counter()
+enabled = "--timing" in sys.argv or os.environ.get("SMARTCROPPER_TIMING") == "1"
+_marks = set()
+
+
+def start(t0):
+    global T0
+    T0 = t0
+
+
+def mark(name):
+    if not enabled or name in _marks: return
+    _marks.add(name)
+    print(f"[Timing] {name}: {(time.perf_counter() - T0) * 1000:.0f} ms")
@@ -1,9 +1,38 @@
 import tkinter as tk
 from tkinter import messagebox, ttk
-from PIL import Image, ImageTk, ImageGrab
+from PIL import ImageTk
 import os
-import shutil
 import math
+from collections import OrderedDict
+from render_cache import PhotoPool, PhotoBuffer
+from image_cache import ImagePrefetcher, decode_fit
+from thumb_cache import get_thumb_cache
+from file_ops import get_file_ops
+import config
+
+# 网格格子尺寸 (缩略图 130 + 选中边框 + 间距)
+CELL_W, CELL_H = 160, 182
+THUMB_SIZE = 130
+DRAWER_BOX = (280, 220)
+LIGHTBOX_MARGIN = 120
+LIGHTBOX_DIM = "#060606"  # 原来截图上盖 210/255 黑色遮罩后的颜色 (#202020 压暗)
+THUMB_CACHE = 600       # 内存里最多保留的网格缩略图数
+
+
+# 一个可复用的网格格子：滚动时换内容、换位置，不销毁重建
+class _GridCell:
+    def __init__(self, canvas, on_click):
+        self.outer = tk.Frame(canvas, bg="#202020")
+        inner = tk.Frame(self.outer, bg="#252526")
+        inner.pack()
+        self.btn = tk.Button(inner, bg="#252526", fg="#666666", bd=0, activebackground="#333333",
+                             command=lambda: on_click(self), takefocus=0)
+        self.btn.pack()
+        self.label = tk.Label(inner, bg="#252526", font=("Arial", 8))
+        self.label.pack(fill=tk.X)
+        self.item = canvas.create_window(-CELL_W, -CELL_H, window=self.outer, anchor="n")
+        self.fname = None
+        self.index = -1
 
 class TrashWindow:
     def __init__(self, root, trash_dir, input_dir, save_dir, save_trash_dir, on_restore_callback):
@@ -12,7 +41,8 @@ class TrashWindow:
         self.input_dir = input_dir
         self.save_dir = save_dir
         self.save_trash_dir = save_trash_dir
-        self.on_restore = on_restore_callback
+        self.on_restore = on_restore_callback   # 恢复完成后调用一次，参数为恢复成功的文件名列表和恢复到的目录
+        self.busy = False                        # 批量操作进行中
         
         # 窗口状态
         self.trash_win = None
@@ -23,7 +53,18 @@ class TrashWindow:
         self.is_select_mode = False
         self.selected_files = set() 
         self.trash_files = []
-        self.trash_thumbnails = [] 
+        self.thumb_pool = PhotoPool()   # 被挤出缓存的缩略图 PhotoImage 按尺寸复用
+        self.thumbs = OrderedDict()     # 文件名 -> PhotoImage (LRU)
+        self.thumb_failed = set()       # 解码失败的文件，显示 "?"
+        self.thumb_cache = None
+        self.drawer_fname = None
+        # 灯箱：前后几张在后台按窗口大小预先解码缩好，左右切换直接命中
+        self.lb_cache = None
+        self.lb_box = None
+        self.lb_buffer = PhotoBuffer()
+        self.cells = {}                 # 文件下标 -> 正在显示的格子
+        self.free_cells = []
+        self.cols = 1
         
         # 动画配置
         self.base_width = 950
@@ -39,6 +80,7 @@ class TrashWindow:
             messagebox.showinfo("提示", "回收站是空的")
             return
 
+        self.thumb_cache = get_thumb_cache()
         self.trash_win = tk.Toplevel(self.root)
         self.trash_win.title(f"回收站 - {len(self.trash_files)} 张图片")
         self.trash_win.configure(bg="#202020")
@@ -90,6 +132,13 @@ class TrashWindow:
         tk.Button(self.bottom_bar, text="🗑️ 清空回收站", command=self.clear_all, 
                   bg="#C53030", fg="white", bd=0, padx=15, pady=5, font=("Microsoft YaHei", 9)).pack(side=tk.LEFT, padx=20, pady=12)
 
+        # 批量操作进度 (执行时才显示)
+        self.progress_frame = tk.Frame(self.bottom_bar, bg="#1E1E1E")
+        self.progress = ttk.Progressbar(self.progress_frame, length=160, mode="determinate")
+        self.progress.pack(side=tk.LEFT)
+        self.lbl_progress = tk.Label(self.progress_frame, text="", fg="#999999", bg="#1E1E1E", font=("Arial", 9))
+        self.lbl_progress.pack(side=tk.LEFT, padx=8)
+
         self.batch_actions = tk.Frame(self.bottom_bar, bg="#1E1E1E")
         self.lbl_sel_count = tk.Label(self.batch_actions, text="0", fg="#007ACC", bg="#1E1E1E", font=("Arial", 12, "bold"))
         self.lbl_sel_count.pack(side=tk.LEFT, padx=(0, 10))
@@ -108,19 +157,19 @@ class TrashWindow:
         self.grid_panel = tk.Frame(self.main_container, bg="#202020")
         self.grid_panel.pack(side=tk.LEFT, fill=tk.BOTH, expand=True)
         
+        # === 虚拟化网格：只为可见的几行创建格子，滚动时回收复用 ===
         self.canvas = tk.Canvas(self.grid_panel, bg="#202020", highlightthickness=0)
-        scrollbar = ttk.Scrollbar(self.grid_panel, orient="vertical", command=self.canvas.yview)
-        self.scroll_frame = tk.Frame(self.canvas, bg="#202020")
-        
-        self.scroll_frame.bind("<Configure>", lambda e: self.canvas.configure(scrollregion=self.canvas.bbox("all")))
-        self.canvas.create_window((0, 0), window=self.scroll_frame, anchor="nw")
-        self.canvas.configure(yscrollcommand=scrollbar.set)
+        self.scrollbar = ttk.Scrollbar(self.grid_panel, orient="vertical", command=self.canvas.yview)
+        self.canvas.configure(yscrollcommand=self.on_grid_scroll)
+        self.canvas.bind("<Configure>", lambda e: self.populate_grid())
+        self.cells = {}; self.free_cells = []
+        self.empty_text = None
         
         self.canvas.pack(side="left", fill="both", expand=True)
-        scrollbar.pack(side="right", fill="y")
+        self.scrollbar.pack(side="right", fill="y")
         
         self.canvas.bind_all("<MouseWheel>", lambda e: self.canvas.yview_scroll(int(-1*(e.delta/120)), "units"))
-        self.trash_win.bind("<Destroy>", lambda e: self.canvas.unbind_all("<MouseWheel>"))
+        self.trash_win.bind("<Destroy>", self.on_destroy)
 
         # Drawer Panel
         self.drawer_panel = tk.Frame(self.main_container, bg="#181818", width=0)
@@ -129,6 +178,16 @@ class TrashWindow:
 
         self.build_drawer_content()
         self.populate_grid()
+        # 第一屏的请求已经排在前面，剩下的在后台按顺序生成，滚动到哪里基本都已经在磁盘缓存里
+        if config.THUMB_PRELOAD:
+            for f in self.trash_files:
+                self.thumb_cache.request(os.path.join(self.trash_dir, f), (THUMB_SIZE, THUMB_SIZE), priority=1)
+
+    def on_destroy(self, e):
+        if e.widget is not self.trash_win: return
+        self.canvas.unbind_all("<MouseWheel>")
+        self.thumb_cache.cancel(self.trash_dir)
+        if self.lb_cache: self.lb_cache.shutdown()
 
     def build_drawer_content(self):
         container = tk.Frame(self.drawer_panel, bg="#181818")
@@ -172,7 +231,7 @@ class TrashWindow:
             self.selected_files.clear()
             self.refresh_drawer(None)
         
-        self.populate_grid()
+        self.update_visible(restyle=True)
         self.smooth_resize(target_w)
 
     def smooth_resize(self, target_w):
@@ -198,56 +257,123 @@ class TrashWindow:
         self.trash_win.after(16, lambda: self.smooth_resize(target_w))
 
     # === 网格交互 ===
+    # 重新排版：列数随宽度变化，滚动区域按总行数设定，再刷新可见格子
     def populate_grid(self):
-        for w in self.scroll_frame.winfo_children(): w.destroy()
-        self.trash_thumbnails = []
-        
-        if not self.trash_files:
-            tk.Label(self.scroll_frame, text="回收站空空如也", bg="#202020", fg="#666666", font=("Microsoft YaHei", 12)).pack(pady=80)
-            return
-
-        cols = 5
-        row, col = 0, 0
-        
-        for idx, fname in enumerate(self.trash_files):
-            path = os.path.join(self.trash_dir, fname)
-            try:
-                img = Image.open(path)
-                img.thumbnail((130, 130))
-                tk_img = ImageTk.PhotoImage(img)
-                self.trash_thumbnails.append(tk_img)
-                
-                is_sel = fname in self.selected_files
-                bg = "#007ACC" if is_sel else "#202020"
-                pad = 3 if is_sel else 0
-                
-                outer = tk.Frame(self.scroll_frame, bg=bg, padx=pad, pady=pad)
-                outer.grid(row=row, column=col, padx=12, pady=12)
-                
-                inner = tk.Frame(outer, bg="#252526")
-                inner.pack()
-                
-                btn = tk.Button(inner, image=tk_img, bg="#252526", bd=0, activebackground="#333333",
-                                command=lambda f=fname, i=idx: self.on_item_click(f, i), takefocus=0)
-                btn.pack()
-                
-                t_fg = "white" if is_sel else "#999999"
-                trunc_name = fname if len(fname)<10 else fname[:8]+".."
-                tk.Label(inner, text=trunc_name, bg="#252526", fg=t_fg, font=("Arial", 8)).pack(fill=tk.X)
-                
-                col+=1
-                if col>=cols: col=0; row+=1
-            except: pass
-            
+        n = len(self.trash_files)
+        w = max(CELL_W, self.canvas.winfo_width())
+        self.cols = max(1, w // CELL_W)
+        rows = math.ceil(n / self.cols)
+        self.canvas.configure(scrollregion=(0, 0, w, rows * CELL_H + 12))
+        if self.empty_text: self.canvas.delete(self.empty_text); self.empty_text = None
+        if not n:
+            self.empty_text = self.canvas.create_text(w // 2, 100, text="回收站空空如也", fill="#666666", font=("Microsoft YaHei", 12))
+        self.update_visible(relayout=True)
         self.update_batch_label()
 
+    def on_grid_scroll(self, first, last):
+        self.scrollbar.set(first, last)
+        self.update_visible()
+
+    # relayout: 下标或列数变了，可见格子全部重新定位/换内容；restyle: 只刷新选中样式
+    def update_visible(self, relayout=False, restyle=False):
+        if not self.trash_win or not self.canvas.winfo_exists(): return
+        n = len(self.trash_files)
+        top = self.canvas.canvasy(0)
+        r0 = max(0, int(top // CELL_H) - 1)
+        r1 = int((top + self.canvas.winfo_height()) // CELL_H) + 1
+        want = range(min(n, r0 * self.cols), min(n, (r1 + 1) * self.cols))
+        for idx in [i for i in self.cells if i not in want]:
+            cell = self.cells.pop(idx)
+            self.canvas.coords(cell.item, -CELL_W, -CELL_H)
+            cell.fname = None
+            self.free_cells.append(cell)
+        for idx in want:
+            cell = self.cells.get(idx)
+            if cell is None:
+                cell = self.free_cells.pop() if self.free_cells else _GridCell(self.canvas, self.on_cell_click)
+                self.cells[idx] = cell
+            elif not relayout and cell.fname == self.trash_files[idx]:
+                if restyle: self.style_cell(cell)
+                continue
+            self.fill_cell(cell, idx)
+
+    def fill_cell(self, cell, idx):
+        fname = self.trash_files[idx]
+        cell.fname, cell.index = fname, idx
+        photo = self.grid_thumbnail(fname)
+        if photo: cell.btn.config(image=photo, text="", width=0, height=0)
+        else: cell.btn.config(image="", text="?" if fname in self.thumb_failed else "…", width=16, height=8)
+        cell.label.config(text=fname if len(fname)<10 else fname[:8]+"..")
+        self.style_cell(cell)
+        r, c = divmod(idx, self.cols)
+        self.canvas.coords(cell.item, c * CELL_W + CELL_W // 2, r * CELL_H + 12)
+
+    def style_cell(self, cell):
+        is_sel = cell.fname in self.selected_files
+        pad = 3 if is_sel else 0
+        cell.outer.config(bg="#007ACC" if is_sel else "#202020", padx=pad, pady=pad)
+        cell.label.config(fg="white" if is_sel else "#999999")
+
+    # 内存里有直接用；磁盘缓存命中就地解出小 JPEG；都没有先显示占位，交给后台生成后再填
+    def grid_thumbnail(self, fname):
+        photo = self.thumbs.get(fname)
+        if photo is not None:
+            self.thumbs.move_to_end(fname)
+            return photo
+        if fname in self.thumb_failed: return None
+        path = os.path.join(self.trash_dir, fname)
+        box = (THUMB_SIZE, THUMB_SIZE)
+        thumb = self.thumb_cache.get(path, box)
+        if thumb is None:
+            self.thumb_cache.request(path, box, lambda p, t, f=fname: self.post_to_ui(lambda: self.on_thumb_ready(f, t)))
+            return None
+        return self.remember_thumb(fname, thumb.image)
+
+    def remember_thumb(self, fname, img):
+        photo = self.thumbs[fname] = self.thumb_pool.get(img)
+        # 正在显示的格子还引用着的不能回收，LRU 上限要比一屏格子数大得多
+        while len(self.thumbs) > THUMB_CACHE:
+            self.thumb_pool.release(self.thumbs.popitem(last=False)[1])
+        return photo
+
+    # 后台线程的结果交回 Tk 线程；窗口已经关了就丢掉
+    def post_to_ui(self, fn):
+        try:
+            if self.trash_win: self.trash_win.after(0, fn)
+        except (RuntimeError, tk.TclError):
+            pass
+
+    def on_thumb_ready(self, fname, thumb):
+        if not self.trash_win or not self.trash_win.winfo_exists(): return
+        if thumb is None: self.thumb_failed.add(fname)
+        elif fname not in self.thumbs: self.remember_thumb(fname, thumb.image)
+        for cell in self.cells.values():
+            if cell.fname == fname: self.fill_cell(cell, cell.index)
+
+    # 恢复/删除后按差量更新：只从列表里去掉这些文件，不重新扫描目录、不重做其他缩略图
+    def remove_from_grid(self, names):
+        names = set(names)
+        if not names: return
+        self.trash_files = [f for f in self.trash_files if f not in names]
+        self.selected_files -= names
+        for f in names:
+            self.thumb_failed.discard(f)
+            photo = self.thumbs.pop(f, None)
+            if photo is not None: self.thumb_pool.release(photo)
+        self.populate_grid()
+
+    def on_cell_click(self, cell):
+        self.on_item_click(cell.fname, cell.index)
+
     def on_item_click(self, fname, idx):
         if self.is_select_mode:
             if fname in self.selected_files:
                 self.selected_files.remove(fname)
             else:
                 self.selected_files.add(fname)
-            self.populate_grid()
+            cell = self.cells.get(idx)
+            if cell: self.style_cell(cell)
+            self.update_batch_label()
             self.refresh_drawer(fname)
         else:
             self.show_lightbox(idx)
@@ -261,123 +387,177 @@ class TrashWindow:
             if self.selected_files:
                 fname = list(self.selected_files)[-1]
             else:
+                self.drawer_fname = None
                 self.d_img_label.config(image="", text="Select an image")
                 self.lbl_d_name.config(text="--")
                 self.lbl_d_res.config(text="--")
                 self.lbl_d_size.config(text="--")
                 return
 
+        self.drawer_fname = fname
         path = os.path.join(self.trash_dir, fname)
-        try:
-            img = Image.open(path)
-            
-            # === FIX 1: 先获取原图分辨率 ===
-            raw_w, raw_h = img.size
-            self.lbl_d_res.config(text=f"{raw_w} x {raw_h}")
-            
-            # 再制作缩略图
-            cw, ch = 280, 220
-            img.thumbnail((cw, ch), Image.Resampling.LANCZOS)
-            tk_img = ImageTk.PhotoImage(img)
-            self.d_img_label.config(image=tk_img, text="")
-            self.d_img_label.image = tk_img
-            
-            self.lbl_d_name.config(text=fname if len(fname)<18 else fname[:15]+"...")
-            self.lbl_d_size.config(text=f"{os.path.getsize(path)/1024:.1f} KB")
-        except: pass
+        self.lbl_d_name.config(text=fname if len(fname)<18 else fname[:15]+"...")
+        try: self.lbl_d_size.config(text=f"{os.path.getsize(path)/1024:.1f} KB")
+        except OSError: self.lbl_d_size.config(text="--")
+        # 预览图和原图分辨率都从缩略图缓存取，没缓存时后台生成，不在界面线程解码原图
+        thumb = self.thumb_cache.get(path, DRAWER_BOX)
+        if thumb is not None:
+            self.show_drawer_thumb(fname, thumb)
+        else:
+            self.d_img_label.config(image="", text="…")
+            self.thumb_cache.request(path, DRAWER_BOX, lambda p, t: self.post_to_ui(lambda: self.show_drawer_thumb(fname, t)))
+
+    def show_drawer_thumb(self, fname, thumb):
+        if fname != self.drawer_fname or not self.d_img_label.winfo_exists(): return
+        if thumb is None:
+            self.d_img_label.config(image="", text="无法读取")
+            self.lbl_d_res.config(text="--")
+            return
+        self.lbl_d_res.config(text=f"{thumb.src_size[0]} x {thumb.src_size[1]}")
+        tk_img = ImageTk.PhotoImage(thumb.image)
+        self.d_img_label.config(image=tk_img, text="")
+        self.d_img_label.image = tk_img
 
     # === 批量操作 (Fix: parent=self.trash_win) ===
     def batch_restore(self):
-        if not self.selected_files: return
+        if not self.selected_files or self.busy: return
         # FIX: 指定父窗口
         if not messagebox.askyesno("确认", f"恢复选中的 {len(self.selected_files)} 张图片?", parent=self.trash_win): return
-        for f in list(self.selected_files):
-            self.restore_file(f)
-        self.post_action_cleanup()
+        self.run_bulk("restore", sorted(self.selected_files))
 
     def batch_delete(self):
-        if not self.selected_files: return
+        if not self.selected_files or self.busy: return
         # FIX: 指定父窗口
         if not messagebox.askyesno("警告", f"永久删除选中的 {len(self.selected_files)} 张图片?", parent=self.trash_win): return
-        for f in list(self.selected_files):
-            self.delete_permanently(f)
-        self.post_action_cleanup()
+        self.run_bulk("delete", sorted(self.selected_files))
         
-    def post_action_cleanup(self):
+    def post_action_cleanup(self, done):
         self.selected_files.clear()
-        self.refresh_file_list()
-        self.populate_grid()
+        self.remove_from_grid(done)
         self.refresh_drawer(None)
         self.trash_win.title(f"回收站 - {len(self.trash_files)} 张图片")
 
     def clear_all(self):
+        if self.busy: return
         # FIX: 指定父窗口
         if messagebox.askyesno("清空", "确定清空回收站吗？操作不可逆。", parent=self.trash_win):
-            for f in self.trash_files: self.delete_permanently(f)
-            self.post_action_cleanup()
-
-    def restore_file(self, fname):
-        try:
-            shutil.move(os.path.join(self.trash_dir, fname), os.path.join(self.input_dir, fname))
-            s_name = os.path.splitext(fname)[0]+".jpg"
-            if os.path.exists(os.path.join(self.save_trash_dir, s_name)):
-                shutil.move(os.path.join(self.save_trash_dir, s_name), os.path.join(self.save_dir, s_name))
-            if self.on_restore: self.on_restore(fname)
-        except: pass
-
-    def delete_permanently(self, fname):
-        try:
-            os.remove(os.path.join(self.trash_dir, fname))
-            s_name = os.path.splitext(fname)[0]+".jpg"
-            p = os.path.join(self.save_trash_dir, s_name)
-            if os.path.exists(p): os.remove(p)
-        except: pass
+            self.run_bulk("delete", list(self.trash_files))
+
+    # 文件移动/删除在后台线程池里做 (带日志，中断后可继续或撤销)，界面只显示进度
+    # from_lightbox: 大图预览里按 Enter 恢复的单张，完成后预览跟着换到下一张，不清空多选
+    def run_bulk(self, kind, names, from_lightbox=False):
+        ops = get_file_ops()
+        if kind == "restore":
+            batch = ops.restore(names, self.trash_dir, self.input_dir, self.save_trash_dir, self.save_dir)
+        else:
+            batch = ops.delete(names, self.trash_dir, self.save_trash_dir)
+        self.busy = True
+        self.progress.config(maximum=batch.total, value=0)
+        self.lbl_progress.config(text=f"{'恢复' if kind == 'restore' else '删除'}中 0/{batch.total}")
+        self.progress_frame.pack(side=tk.LEFT, padx=10)
+        # 窗口关掉以后操作照样做完，完成通知走主窗口，保证主界面拿到恢复的文件
+        ops.run(batch, on_progress=lambda d, t: self.post_to_ui(lambda: self.on_bulk_progress(kind, d, t)),
+                on_done=lambda b: self.root.after(0, lambda: self.on_bulk_done(b, from_lightbox)))
+
+    def on_bulk_progress(self, kind, done, total):
+        if not self.progress.winfo_exists(): return
+        self.progress.config(value=done)
+        self.lbl_progress.config(text=f"{'恢复' if kind == 'restore' else '删除'}中 {done}/{total}")
+
+    def on_bulk_done(self, batch, from_lightbox=False):
+        self.busy = False
+        ok = batch.succeeded()
+        self.thumb_cache.forget(*[os.path.join(self.trash_dir, f) for f in ok])
+        if batch.kind == "restore" and ok and self.on_restore: self.on_restore(ok, self.input_dir)
+        if not self.trash_win or not self.trash_win.winfo_exists(): return
+        self.progress_frame.pack_forget()
+        if self.lb_cache:
+            for f in ok: self.lb_cache.invalidate(os.path.join(self.trash_dir, f))
+        shown = self.trash_files[self.lightbox_index] if self.overlay_active and self.lightbox_index < len(self.trash_files) else None
+        if from_lightbox:
+            self.remove_from_grid(ok)
+            self.trash_win.title(f"回收站 - {len(self.trash_files)} 张图片")
+        else: self.post_action_cleanup(ok)
+        if self.overlay_active: self.follow_lightbox(shown)
+        failures = batch.failures()
+        if failures:
+            lines = [f"{name}: {err}" for name, err in list(failures.items())[:10]]
+            if len(failures) > 10: lines.append(f"... 共 {len(failures)} 个")
+            messagebox.showwarning("部分文件失败", f"{len(failures)} 个文件未能{'恢复' if batch.kind == 'restore' else '删除'}:\n" + "\n".join(lines), parent=self.trash_win)
+        if batch.error:
+            messagebox.showerror("操作中断", f"批量{'恢复' if batch.kind == 'restore' else '删除'}没有完成: {batch.error}\n\n下次启动时可以选择继续完成或撤销。", parent=self.trash_win)
 
     # === Lightbox ===
     def show_lightbox(self, idx):
         self.lightbox_index = idx
         self.overlay_active = True
+        w, h = self.trash_win.winfo_width(), self.trash_win.winfo_height()
         
-        self.trash_win.update()
-        try:
-            x, y = self.trash_win.winfo_rootx(), self.trash_win.winfo_rooty()
-            w, h = self.trash_win.winfo_width(), self.trash_win.winfo_height()
-            ss = ImageGrab.grab((x,y,x+w,y+h))
-            dim = Image.new('RGBA', (w,h), (0,0,0,210))
-            ss.paste(dim, (0,0), dim)
-            self.bg_photo = ImageTk.PhotoImage(ss)
-        except: self.bg_photo = None
-        
-        self.overlay = tk.Canvas(self.trash_win, bg="black", highlightthickness=0)
+        # 不再截屏做暗化背景 (截屏要先强制重绘整个窗口，还要在界面线程里合成一整张图)，直接铺暗色
+        self.overlay = tk.Canvas(self.trash_win, bg=LIGHTBOX_DIM, highlightthickness=0)
         self.overlay.place(x=0, y=0, relwidth=1, relheight=1)
-        if self.bg_photo: self.overlay.create_image(0,0,image=self.bg_photo, anchor="nw")
         
-        self.lb_img = tk.Label(self.overlay, bg="black")
+        self.lb_img = tk.Label(self.overlay, bg=LIGHTBOX_DIM)
+        self.lb_buffer = PhotoBuffer()   # 新的 Label，要重新绑定 PhotoImage
         self.overlay.create_window(w//2, h//2, window=self.lb_img)
         
         tk.Label(self.overlay, text="←/→ 切换 | Enter 恢复 | Del 删除 | Esc 关闭", 
-                 bg="black", fg="#666666", font=("Arial", 9)).place(relx=0.5, rely=0.9, anchor="center")
+                 bg=LIGHTBOX_DIM, fg="#666666", font=("Arial", 9)).place(relx=0.5, rely=0.9, anchor="center")
         
         self.update_lightbox()
         self.overlay.focus_set()
 
+    def lightbox_cache(self):
+        box = (max(1, self.trash_win.winfo_width() - LIGHTBOX_MARGIN), max(1, self.trash_win.winfo_height() - LIGHTBOX_MARGIN))
+        if self.lb_cache is None:
+            self.lb_cache = ImagePrefetcher(config.LIGHTBOX_PREFETCH, config.LIGHTBOX_PREFETCH,
+                                            config.LIGHTBOX_CACHE_MB, workers=1)
+        # 窗口大小变了，缓存里缩好的图尺寸不对，全部作废
+        if box != self.lb_box:
+            self.lb_box = box
+            self.lb_cache.invalidate()
+            self.lb_cache.decode = lambda p: decode_fit(p, *box)
+        return self.lb_cache
+
+    # 预取没命中时不在界面线程解码：先显示暗色占位，后台解码完再交回 Tk 线程 (和缩略图网格一样)
     def update_lightbox(self):
         if not self.trash_files: self.close_lightbox(); return
         fname = self.trash_files[self.lightbox_index]
         self.trash_win.title(f"预览: {fname}")
+        cache = self.lightbox_cache()
         try:
-            img = Image.open(os.path.join(self.trash_dir, fname))
-            ww, wh = self.trash_win.winfo_width(), self.trash_win.winfo_height()
-            img.thumbnail((ww-120, wh-120), Image.Resampling.BILINEAR)
-            tk_img = ImageTk.PhotoImage(img)
-            self.lb_img.config(image=tk_img)
-            self.lb_img.image = tk_img
-        except: pass
+            decoded, fut = cache.get_nowait(os.path.join(self.trash_dir, fname))
+        except Exception as e:
+            decoded, fut = None, None
+            print(f"[Trash] preview failed: {fname} ({e})")
+        if decoded is not None: self.show_lightbox_image(decoded)
+        else:
+            self.lb_img.config(image="", text="加载中..." if fut else "无法预览", fg="#666666")
+            if fut: fut.add_done_callback(lambda f: self.post_to_ui(lambda: self.on_lightbox_ready(fname, f)))
+        cache.schedule(self.trash_dir, self.trash_files, self.lightbox_index)
+
+    def show_lightbox_image(self, decoded):
+        self.lb_buffer.show(decoded.image)
+        self.lb_img.config(image=self.lb_buffer.photo, text="")
+
+    def on_lightbox_ready(self, fname, fut):
+        # 等待期间已经翻到别的图或关了预览
+        if not self.overlay_active or not self.trash_files: return
+        if self.trash_files[self.lightbox_index % len(self.trash_files)] != fname: return
+        decoded = None if fut.cancelled() else fut.result()
+        if decoded is not None: self.show_lightbox_image(decoded)
+        else: self.lb_img.config(image="", text="无法预览")
+
+    # 恢复/删除完成后预览停在原来那张；它被移走了就显示原位置的下一张
+    def follow_lightbox(self, shown):
+        if not self.trash_files: self.close_lightbox(); return
+        if shown in self.trash_files: self.lightbox_index = self.trash_files.index(shown)
+        elif self.lightbox_index >= len(self.trash_files): self.lightbox_index = 0
+        self.update_lightbox()
 
     def close_lightbox(self):
         self.overlay_active = False
         if hasattr(self, 'overlay'): self.overlay.destroy()
-        self.populate_grid()
         self.trash_win.title(f"回收站 - {len(self.trash_files)} 张图片")
 
     def on_key_esc(self, e):
@@ -396,14 +576,6 @@ class TrashWindow:
             
     def on_key_enter(self, e):
         if self.overlay_active:
-            f = self.trash_files[self.lightbox_index]
-            self.restore_file(f)
-            self.trash_files.pop(self.lightbox_index)
-            self.refresh_file_list()
-            self.populate_grid()
-            if self.lightbox_index >= len(self.trash_files): 
-                self.lightbox_index = 0
-            if not self.trash_files: 
-                self.close_lightbox()
-            else: 
-                self.update_lightbox()
\ No newline at end of file
+            if self.busy: return
+            # 和批量操作一样在后台线程里移动文件，完成后 on_bulk_done 更新列表和预览
+            self.run_bulk("restore", [self.trash_files[self.lightbox_index]], from_lightbox=True)
\ No newline at end of file
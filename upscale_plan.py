@@ -0,0 +1,59 @@
+import math
+import config
+from model_registry import registry
+
+
+# === AI 放大规划：用最便宜的方式达到锁定的输出尺寸 ===
+# 每个模型固定放大 model.scale 倍，推理耗时和输入像素数成正比。
+# 裁剪图比需要的大时先缩小到“放大后刚好够目标尺寸”，省下的时间是平方级的；
+# 有多个模型时，在放大倍数够用的模型里挑预计耗时最短的。
+# 需要的倍数太小 (< AI_MIN_FACTOR) 就不走 AI，直接 LANCZOS
+class UpscalePlan:
+    def __init__(self, factor, use_ai, model=None, pre_size=None, input_size=None):
+        self.factor = factor            # 需要的总放大倍数
+        self.use_ai = use_ai
+        self.model = model              # ModelInfo
+        self.model_scale = model.scale if model else 0
+        self.pre_size = pre_size        # AI 之前先缩小到的尺寸，None 表示不缩
+        self.input_size = input_size    # 实际送进模型的尺寸
+        self.tile = min(config.AI_TILE_SIZE, model.tile) if model else config.AI_TILE_SIZE
+        self.est_seconds = 0.0
+        if use_ai and input_size:
+            self.est_seconds = input_size[0] * input_size[1] / 1e6 * model.sec_per_mpix
+
+    def describe(self):
+        if not self.use_ai:
+            if self.factor < config.AI_MIN_FACTOR:
+                return f"放大 {self.factor:.2f}倍 (低于 {config.AI_MIN_FACTOR}倍，不启用 AI)"
+            return f"放大 {self.factor:.2f}倍 (未找到 AI 模型，使用普通缩放)"
+        precision = "" if self.model.precision == "fp32" else f" {self.model.precision.upper()}"
+        text = f"✨ AI {self.model.name} ({self.model_scale}x{precision}) | 需放大 {self.factor:.2f}倍"
+        if self.pre_size: text += f"\n先缩至 {self.pre_size[0]}x{self.pre_size[1]} 再推理"
+        text += f"\n预计耗时 ≈ {self.est_seconds:.1f}s"
+        return text
+
+
+def _plan_for(model, crop_size, target_size, factor):
+    cw, ch = crop_size
+    tw, th = target_size
+    need_w, need_h = math.ceil(tw / model.scale), math.ceil(th / model.scale)
+    if cw > need_w and ch > need_h:
+        k = max(need_w / cw, need_h / ch)
+        pre = (max(need_w, math.ceil(cw * k)), max(need_h, math.ceil(ch * k)))
+        return UpscalePlan(factor, True, model, pre, pre)
+    return UpscalePlan(factor, True, model, None, (max(1, round(cw)), max(1, round(ch))))
+
+
+# models: 候选 ModelInfo 列表，默认取模型登记表
+def plan_upscale(crop_size, target_size, models=None):
+    if models is None: models = registry.models()
+    cw, ch = crop_size
+    tw, th = target_size
+    factor = max(tw / cw, th / ch)
+    if factor < config.AI_MIN_FACTOR or not models:
+        return UpscalePlan(factor, False)
+
+    # 倍数都不够时用倍数最大的，剩下的交给 LANCZOS；耗时相同优先小倍数 (预缩丢的细节少)
+    able = [m for m in models if m.scale >= factor] or [max(models, key=lambda m: m.scale)]
+    plans = [_plan_for(m, crop_size, target_size, factor) for m in able]
+    return min(plans, key=lambda p: (p.est_seconds, p.model_scale))
@@ -1,19 +1,105 @@
 import os
+import json
+import time
+import threading
+from collections import OrderedDict, deque
+from concurrent.futures import Future
 import numpy as np
 import onnxruntime as ort
 from PIL import Image
+import config
+
+
+# === 分块推理工具 ===
+# 起点列表：步长 tile - overlap，最后一块贴齐末尾
+def _tile_starts(n, tile, overlap):
+    if n <= tile: return [0]
+    stride = max(1, tile - overlap)
+    return list(range(0, n - tile, stride)) + [n - tile]
+
+
+# 一维羽化权重：和相邻块重叠的一侧线性渐变，贴着图像边界的一侧保持 1
+def _feather(length, ramp, at_start, at_end):
+    w = np.ones(length, np.float32)
+    ramp = min(ramp, length)
+    if ramp > 0:
+        r = (np.arange(ramp, dtype=np.float32) + 0.5) / ramp
+        if not at_start: w[:ramp] = np.minimum(w[:ramp], r)
+        if not at_end: w[length - ramp:] = np.minimum(w[length - ramp:], r[::-1])
+    return w
+
+
+# === onnxruntime 会话参数 ===
+_OPT_LEVELS = {
+    "disable": ort.GraphOptimizationLevel.ORT_DISABLE_ALL,
+    "basic": ort.GraphOptimizationLevel.ORT_ENABLE_BASIC,
+    "extended": ort.GraphOptimizationLevel.ORT_ENABLE_EXTENDED,
+    "all": ort.GraphOptimizationLevel.ORT_ENABLE_ALL,
+}
+_EXEC_MODES = {
+    "sequential": ort.ExecutionMode.ORT_SEQUENTIAL,
+    "parallel": ort.ExecutionMode.ORT_PARALLEL,
+}
+_SETTING_KEYS = ("intra_threads", "inter_threads", "opt_level", "mem_arena", "exec_mode")
+
+
+# config 里的默认值，再用 autotune 写出的 AI_ORT_SETTINGS 覆盖
+def load_ort_settings():
+    settings = {
+        "intra_threads": config.AI_ORT_INTRA_THREADS,
+        "inter_threads": config.AI_ORT_INTER_THREADS,
+        "opt_level": config.AI_ORT_OPT_LEVEL,
+        "mem_arena": config.AI_ORT_MEM_ARENA,
+        "exec_mode": config.AI_ORT_EXEC_MODE,
+    }
+    if os.path.exists(config.AI_ORT_SETTINGS):
+        try:
+            with open(config.AI_ORT_SETTINGS, encoding='utf-8') as f:
+                saved = json.load(f)
+            settings.update({k: saved[k] for k in _SETTING_KEYS if k in saved})
+        except Exception as e:
+            print(f"[Warn] Ignoring {config.AI_ORT_SETTINGS}: {e}")
+    return settings
+
+
+def make_session_options(settings, optimized_path=None):
+    so = ort.SessionOptions()
+    so.intra_op_num_threads = int(settings["intra_threads"])
+    so.inter_op_num_threads = int(settings["inter_threads"])
+    so.graph_optimization_level = _OPT_LEVELS[settings["opt_level"]]
+    so.enable_cpu_mem_arena = bool(settings["mem_arena"])
+    so.execution_mode = _EXEC_MODES[settings["exec_mode"]]
+    if optimized_path: so.optimized_model_filepath = optimized_path
+    return so
+
+
+# 优化后模型的缓存文件。extended/all 级别的优化结果和设备相关，按优化等级 + 设备分开存
+def _optimized_path(model_path, settings):
+    device = "cuda" if "CUDAExecutionProvider" in ort.get_available_providers() else "cpu"
+    base, _ = os.path.splitext(model_path)
+    return f"{base}.opt-{settings['opt_level']}-{device}.onnx"
+
+
+class Cancelled(Exception):
+    pass
+
 
 class AIUpscaler:
-    def __init__(self, model_path="4x-UltraSharp.onnx"):
+    def __init__(self, model_path="4x-UltraSharp.onnx", settings=None):
         self.model_path = model_path
+        self.settings = settings or load_ort_settings()
         self.session = None
         self.is_ready = False
+        self.scale = None                  # 模型放大倍数，第一次推理时探测
+        self._local = threading.local()    # 每个线程自己的推理缓冲 (保存队列可能多线程同时调用)
+        self._batcher = None
+        self._batcher_lock = threading.Lock()
         
         if os.path.exists(self.model_path):
             try:
                 # 优先尝试 GPU 加速，没有则用 CPU
                 providers = ['CUDAExecutionProvider', 'CPUExecutionProvider']
-                self.session = ort.InferenceSession(self.model_path, providers=providers)
+                self.session = self._create_session(providers)
                 self.is_ready = True
                 # === 修复：去掉 Emoji，改用普通字符防止报错 ===
                 print(f"[OK] AI Model Loaded: {self.model_path}") 
@@ -22,7 +108,7 @@ class AIUpscaler:
                 print(f"[Error] Failed to load model: {e}")
                 # 降级尝试纯 CPU
                 try:
-                    self.session = ort.InferenceSession(self.model_path, providers=['CPUExecutionProvider'])
+                    self.session = self._create_session(['CPUExecutionProvider'])
                     self.is_ready = True
                     print(f"[Info] Fallback to CPU success")
                 except:
@@ -31,40 +117,389 @@ class AIUpscaler:
             # === 修复：去掉 Emoji ===
             print(f"[Error] Model not found: {self.model_path}")
 
-    def process(self, pil_image):
+    # 有比模型文件新的优化缓存就直接加载 (跳过图优化)，否则优化一次并存盘
+    def _create_session(self, providers):
+        s = self.settings
+        opt = None
+        if config.AI_ORT_CACHE_OPTIMIZED and s["opt_level"] != "disable":
+            opt = _optimized_path(self.model_path, s)
+            if os.path.exists(opt) and os.path.getmtime(opt) >= os.path.getmtime(self.model_path):
+                try:
+                    return ort.InferenceSession(opt, sess_options=make_session_options(dict(s, opt_level="disable")), providers=providers)
+                except Exception as e:
+                    print(f"[Warn] Cached optimized model unusable ({e}), rebuilding")
+        try:
+            return ort.InferenceSession(self.model_path, sess_options=make_session_options(s, opt), providers=providers)
+        except Exception:
+            if opt is None: raise
+            # 优化结果存不了盘 (目录只读等) 也照常加载
+            return ort.InferenceSession(self.model_path, sess_options=make_session_options(s), providers=providers)
+
+    # 预热：跑一次很小的推理，让 onnxruntime 完成首次内存分配/内核选择
+    def warmup(self):
+        if not self.is_ready: return False
+        try:
+            self._infer(np.zeros((32, 32, 3), np.uint8))
+            return True
+        except Exception as e:
+            print(f"[Error] AI warm-up failed: {e}")
+            return False
+
+    # tile: 分块边长 (输入像素)，0 表示整张一次推理；overlap: 相邻块重叠像素
+    # 分块时峰值内存 (模型中间激活) 只和 tile 有关，和裁剪图大小无关。
+    # 某一块推理失败 (通常是内存不足) 会自动减半 tile 重来，直到 AI_TILE_MIN
+    # cancel: threading.Event，分块推理时每行块检查一次，被取消返回 None
+    def process(self, pil_image, tile=None, overlap=None, cancel=None):
         if not self.is_ready:
             return pil_image
+        if tile is None: tile = config.AI_TILE_SIZE
+        if overlap is None: overlap = config.AI_TILE_OVERLAP
 
         try:
-            # 1. 预处理
-            img = np.array(pil_image).astype(np.float32) / 255.0
-            # 补齐 alpha 通道处理
-            if img.ndim == 3 and img.shape[2] == 4:
-                img = img[:, :, :3]
-            # 兼容灰度图
-            if img.ndim == 2:
-                img = np.stack((img,)*3, axis=-1)
-                
-            img = img.transpose((2, 0, 1)) # HWC -> CHW
-            img = np.expand_dims(img, axis=0) # Batch dimension
-
-            # 2. 推理
-            input_name = self.session.get_inputs()[0].name
-            output = self.session.run(None, {input_name: img})[0]
-
-            # 3. 后处理
-            output = output.squeeze(0).transpose((1, 2, 0)) # CHW -> HWC
-            output = np.clip(output * 255.0, 0, 255).astype(np.uint8)
-            
-            return Image.fromarray(output)
+            # 1. 预处理：灰度 / 带 alpha 的图统一转成 RGB，保持 uint8，归一化在写入推理缓冲时顺带完成
+            if pil_image.mode != 'RGB': pil_image = pil_image.convert('RGB')
+            img = np.asarray(pil_image)
         except Exception as e:
             print(f"[Error] AI Processing failed: {e}")
             return pil_image
 
-# 单例模式
-_instance = None
-def get_upscaler():
-    global _instance
-    if _instance is None:
-        _instance = AIUpscaler()
-    return _instance
\ No newline at end of file
+        h, w = img.shape[:2]
+        while True:
+            try:
+                if tile <= 0 or (h <= tile and w <= tile):
+                    output = self._to_uint8(self._infer(img))
+                else:
+                    output = self._process_tiled(img, tile, min(overlap, tile // 4), cancel)
+                # RGB 模式下 fromarray 会复制一份，复用的缓冲之后可以放心覆盖
+                return Image.fromarray(output)
+            except Cancelled:
+                return None
+            except Exception as e:
+                # 整图失败 -> 改用默认分块；分块失败 -> 块减半
+                next_tile = config.AI_TILE_SIZE if tile <= 0 else tile // 2
+                if next_tile < config.AI_TILE_MIN or next_tile <= 0 or (tile > 0 and next_tile >= tile):
+                    print(f"[Error] AI Processing failed: {e}")
+                    return pil_image
+                print(f"[Warn] AI tile {tile or 'full'} failed ({e}), retry with tile {next_tile}")
+                tile = next_tile
+
+    # === 推理缓冲 ===
+    # 每种输入尺寸一组预分配的 NCHW 输入/输出缓冲，并用 IO binding 绑定到会话上，
+    # 推理结果直接写进输出缓冲，不再经过 onnxruntime 返回的新数组。
+    # 分块推理时块尺寸固定，整张图只会用到一两组缓冲
+    def _buffers(self, h, w, n=1):
+        cache = getattr(self._local, "buffers", None)
+        if cache is None: cache = self._local.buffers = OrderedDict()
+        key = (n, h, w)
+        buf = cache.get(key)
+        if buf is not None:
+            cache.move_to_end(key)
+            return buf
+        if self.scale is None: self._probe_scale()
+        buf = _InferBuffers(self.session, h, w, self.scale, n)
+        # 超过上限的大缓冲 (整图推理大图) 用完即弃，不常驻内存
+        if buf.nbytes <= config.AI_BUFFER_CACHE_MB * 1024 * 1024:
+            cache[key] = buf
+            total = sum(b.nbytes for b in cache.values())
+            while total > config.AI_BUFFER_CACHE_MB * 1024 * 1024 and len(cache) > 1:
+                total -= cache.popitem(last=False)[1].nbytes
+        return buf
+
+    def _probe_scale(self):
+        x = np.zeros((1, 3, 16, 16), np.float32)
+        input_name = self.session.get_inputs()[0].name
+        self.scale = self.session.run(None, {input_name: x})[0].shape[2] // 16
+
+    # HWC uint8 -> 放大后 CHW float32 (0~1)。返回的是本线程复用的缓冲，下次推理前要用完
+    def _infer(self, img):
+        h, w = img.shape[:2]
+        buf = self._buffers(h, w)
+        # 转置 + 归一化一步写进输入缓冲，没有中间数组
+        np.multiply(img.transpose((2, 0, 1)), np.float32(1 / 255), out=buf.input[0])
+        self.session.run_with_iobinding(buf.binding)
+        return buf.output[0]
+
+    # 一批同尺寸 HWC uint8 -> 各自放大后的 CHW float32 (复制出来，缓冲马上要给下一批用)
+    def _infer_batch(self, imgs):
+        h, w = imgs[0].shape[:2]
+        buf = self._buffers(h, w, len(imgs))
+        for i, img in enumerate(imgs):
+            np.multiply(img.transpose((2, 0, 1)), np.float32(1 / 255), out=buf.input[i])
+        self.session.run_with_iobinding(buf.binding)
+        return [o.copy() for o in buf.output]
+
+    # 模型的 batch 维是动态的才能批处理 (导出时固定为 1 的模型只能一块一块推)
+    @property
+    def batcher(self):
+        if config.AI_BATCH_MAX <= 1 or not self.is_ready: return None
+        if self.session.get_providers()[0] == 'CPUExecutionProvider' and not config.AI_BATCH_ON_CPU: return None
+        with self._batcher_lock:
+            if self._batcher is None:
+                if isinstance(self.session.get_inputs()[0].shape[0], int): return None
+                self._batcher = TileBatcher(self._infer_batch, config.AI_BATCH_MAX, config.AI_BATCH_WINDOW_MS)
+        return self._batcher
+
+    # CHW float32 -> HWC uint8 (原地缩放/截断，再转置写进复用的 uint8 缓冲)
+    def _to_uint8(self, chw, out=None):
+        np.multiply(chw, 255.0, out=chw)
+        np.clip(chw, 0, 255, out=chw)
+        if out is None: out = np.empty((chw.shape[1], chw.shape[2], 3), np.uint8)
+        np.copyto(out, chw.transpose((1, 2, 0)), casting='unsafe')
+        return out
+
+    # 分块推理 + 羽化融合。按块行推进，已经不会再被后续块覆盖的输出行立即归一化写入结果；
+    # 累加缓冲只有一条块行高，整张图推理过程中只分配一次
+    def _process_tiled(self, img, tile, overlap, cancel=None):
+        h, w = img.shape[:2]
+        ys = _tile_starts(h, tile, overlap)
+        xs = _tile_starts(w, tile, overlap)
+        if self.scale is None: self._probe_scale()
+        s = self.scale
+        band = min(tile, h) * s
+        out = np.empty((h * s, w * s, 3), np.uint8)
+        acc = np.zeros((3, band, w * s), np.float32)    # 覆盖输出行 [top, top + band)
+        wsum = np.zeros((band, w * s), np.float32)
+        wbuf = np.empty((band, min(tile, w) * s), np.float32)   # 当前块的二维羽化权重
+        batcher = self.batcher
+        top = 0
+        for r, y0 in enumerate(ys):
+            if cancel is not None and cancel.is_set(): raise Cancelled()
+            th = min(tile, h - y0)
+            crops = [img[y0:y0+th, x0:x0 + min(tile, w - x0)] for x0 in xs]
+            # 有批处理时一整行块一次交出去，由 TileBatcher 凑批；否则逐块推理
+            if batcher: results = (f.result() for f in [batcher.submit(c) for c in crops])
+            else: results = (self._infer(c) for c in crops)
+            for x0, res in zip(xs, results):
+                tw = min(tile, w - x0)
+                wy = _feather(th * s, overlap * s, y0 == 0, y0 + th >= h)
+                wx = _feather(tw * s, overlap * s, x0 == 0, x0 + tw >= w)
+                wt = np.multiply.outer(wy, wx, out=wbuf[:th * s, :tw * s])
+                oy0, oy1 = y0 * s - top, (y0 + th) * s - top
+                ox0, ox1 = x0 * s, (x0 + tw) * s
+                np.multiply(res, wt, out=res)
+                acc[:, oy0:oy1, ox0:ox1] += res
+                wsum[oy0:oy1, ox0:ox1] += wt
+            final = ys[r + 1] * s if r + 1 < len(ys) else h * s
+            n = final - top
+            if n > 0:
+                blk = acc[:, :n]
+                np.maximum(wsum[:n], 1e-6, out=wsum[:n])
+                np.divide(blk, wsum[:n], out=blk)
+                self._to_uint8(blk, out[top:final])
+                # 与下一块行重叠的部分挪到缓冲开头，其余清零
+                keep = band - n
+                if keep > 0:
+                    acc[:, :keep] = acc[:, n:]
+                    wsum[:keep] = wsum[n:]
+                acc[:, keep:] = 0
+                wsum[keep:] = 0
+                top = final
+        return out
+
+
+# 一组固定尺寸的推理缓冲 + 已绑定好的 IO binding
+class _InferBuffers:
+    def __init__(self, session, h, w, scale, n=1):
+        self.input = np.empty((n, 3, h, w), np.float32)
+        self.output = np.empty((n, 3, h * scale, w * scale), np.float32)
+        self.nbytes = self.input.nbytes + self.output.nbytes
+        self.binding = session.io_binding()
+        self.binding.bind_cpu_input(session.get_inputs()[0].name, self.input)
+        self.binding.bind_output(session.get_outputs()[0].name, 'cpu', 0, np.float32,
+                                 self.output.shape, self.output.ctypes.data)
+
+
+# === 动态批处理 ===
+# 各线程把块交进来拿 Future；后台线程收到第一块后最多再等 window_ms 凑批，
+# 凑满 max_batch 立即推理。同一批只放同尺寸的块，window_ms 就是凑批给单块增加的延迟上限
+class TileBatcher:
+    def __init__(self, run_batch, max_batch=4, window_ms=5):
+        self.run_batch = run_batch
+        self.max_batch = max(1, max_batch)
+        self.window = window_ms / 1000
+        self._queue = deque()   # (img, Future)
+        self._cond = threading.Condition()
+        self.batches = 0
+        self.items = 0
+        threading.Thread(target=self._loop, daemon=True).start()
+
+    def submit(self, img):
+        fut = Future()
+        with self._cond:
+            self._queue.append((img, fut))
+            self._cond.notify()
+        return fut
+
+    @property
+    def mean_batch(self):
+        return self.items / self.batches if self.batches else 0.0
+
+    def _loop(self):
+        while True:
+            with self._cond:
+                while not self._queue: self._cond.wait()
+                deadline = time.perf_counter() + self.window
+                while len(self._queue) < self.max_batch:
+                    left = deadline - time.perf_counter()
+                    if left <= 0: break
+                    self._cond.wait(left)
+                shape = self._queue[0][0].shape
+                batch, rest = [], []
+                while self._queue and len(batch) < self.max_batch:
+                    item = self._queue.popleft()
+                    (batch if item[0].shape == shape else rest).append(item)
+                self._queue.extendleft(reversed(rest))
+            batch = [(img, fut) for img, fut in batch if fut.set_running_or_notify_cancel()]
+            if not batch: continue
+            self.batches += 1
+            self.items += len(batch)
+            try:
+                outs = self.run_batch([img for img, _ in batch])
+                for (_, fut), out in zip(batch, outs): fut.set_result(out)
+            except Exception as e:
+                for _, fut in batch: fut.set_exception(e)
+
+# 每个模型一个实例，按 AI_MODEL_MEMORY_MB 估算内存做 LRU 卸载
+# (预热线程和保存线程可能同时来取，加锁防止重复创建会话)
+# AI_WORKER_PROCESSES > 0 时返回子进程池，接口相同
+_instances = OrderedDict()   # path -> (upscaler, mem_mb)
+_instance_lock = threading.Lock()
+def get_upscaler(model_path=None):
+    from model_registry import registry
+    info = registry.find(model_path) if model_path else registry.default()
+    # 按 AI_PRECISION 选用 fp16 / int8 版本
+    path = info.session_path if info else (model_path or config.AI_LEGACY_MODEL)
+    with _instance_lock:
+        entry = _instances.get(path)
+        if entry:
+            _instances.move_to_end(path)
+            return entry[0]
+        if config.AI_WORKER_PROCESSES > 0:
+            from ai_worker import UpscalerPool
+            up = UpscalerPool(path, workers=config.AI_WORKER_PROCESSES)
+        else:
+            up = AIUpscaler(path)
+        _instances[path] = (up, info.mem_mb if info else 0)
+        total = sum(mem for _, mem in _instances.values())
+        while total > config.AI_MODEL_MEMORY_MB and len(_instances) > 1:
+            old_path, (old, mem) = _instances.popitem(last=False)
+            total -= mem
+            if hasattr(old, "close"): old.close()
+            print(f"[Info] Unloaded AI model: {old_path}")
+    return up
+
+# === 命令行工具 ===
+# python upscaler.py check-tiles <图片>  对比分块与整图推理结果
+def _check_tiles(args):
+    up = AIUpscaler(args.model)
+    if not up.is_ready: return
+    img = Image.open(args.image).convert('RGB')
+    full = np.asarray(up.process(img, tile=0)).astype(np.int16)
+    tiled = np.asarray(up.process(img, tile=args.tile, overlap=args.overlap)).astype(np.int16)
+    diff = np.abs(full - tiled)
+    ok = diff.mean() <= config.AI_TILE_TOLERANCE_MEAN and diff.max() <= config.AI_TILE_TOLERANCE_MAX
+    print(f"tile={args.tile} overlap={args.overlap}: mean abs diff {diff.mean():.3f}, max {diff.max()} -> {'OK' if ok else 'OUT OF TOLERANCE'}")
+
+
+# python upscaler.py autotune  在本机扫描线程配置，把最快的一组写进 AI_ORT_SETTINGS
+def _autotune(args):
+    base = load_ort_settings()
+    cpus = os.cpu_count() or 1
+    threads = sorted({t for t in (1, 2, 4, 8, 16, cpus // 2, cpus) if 1 <= t <= cpus})
+    candidates = [dict(base, intra_threads=t, inter_threads=1, exec_mode="sequential") for t in threads]
+    candidates += [dict(base, intra_threads=t, inter_threads=2, exec_mode="parallel") for t in threads if t * 2 <= cpus]
+    x = np.random.default_rng(0).integers(0, 256, (args.size, args.size, 3), dtype=np.uint8)
+
+    best, best_ms = None, None
+    for c in candidates:
+        up = AIUpscaler(args.model, settings=c)
+        if not up.is_ready: return
+        up._infer(x)
+        times = []
+        for _ in range(args.runs):
+            t = time.perf_counter()
+            up._infer(x)
+            times.append((time.perf_counter() - t) * 1000)
+        ms = sorted(times)[len(times) // 2]
+        print(f"intra={c['intra_threads']:<3} inter={c['inter_threads']:<2} {c['exec_mode']:<10}: {ms:8.1f} ms")
+        if best_ms is None or ms < best_ms: best, best_ms = c, ms
+
+    with open(config.AI_ORT_SETTINGS, 'w', encoding='utf-8') as f:
+        json.dump({k: best[k] for k in _SETTING_KEYS}, f, indent=2)
+    print(f"Fastest: intra={best['intra_threads']} inter={best['inter_threads']} {best['exec_mode']} ({best_ms:.1f} ms) -> {config.AI_ORT_SETTINGS}")
+
+
+# 进程峰值常驻内存 (MB)，Windows 上没有 resource 模块时返回 None
+def _peak_rss_mb():
+    try:
+        import resource
+    except ImportError:
+        return None
+    import sys
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    return peak / (1024 * 1024) if sys.platform == "darwin" else peak / 1024
+
+
+# python upscaler.py bench <图片>  测单张图的 AI 放大耗时、numpy 临时内存峰值和进程峰值内存
+def _bench(args):
+    import tracemalloc
+    up = AIUpscaler(args.model)
+    if not up.is_ready: return
+    img = Image.open(args.image).convert('RGB')
+    up.process(img, tile=args.tile)
+    times = []
+    tracemalloc.start()
+    for _ in range(args.runs):
+        t = time.perf_counter()
+        up.process(img, tile=args.tile)
+        times.append((time.perf_counter() - t) * 1000)
+    _, peak = tracemalloc.get_traced_memory()
+    tracemalloc.stop()
+    rss = _peak_rss_mb()
+    print(f"{img.width}x{img.height} tile={args.tile}: median {sorted(times)[len(times) // 2]:.1f} ms | "
+          f"numpy peak {peak / (1024 * 1024):.1f} MB | peak RSS {'n/a' if rss is None else f'{rss:.0f} MB'}")
+
+
+# python upscaler.py bench-batch  批大小 1/2/4/8 下的推理吞吐 (块/秒)
+def _bench_batch(args):
+    up = AIUpscaler(args.model)
+    if not up.is_ready: return
+    sizes = [1, 2, 4, 8]
+    if isinstance(up.session.get_inputs()[0].shape[0], int):
+        print("[Info] Model has a fixed batch size, only batch 1 is possible")
+        sizes = [1]
+    rng = np.random.default_rng(0)
+    for n in sizes:
+        tiles = [rng.integers(0, 256, (args.size, args.size, 3), dtype=np.uint8) for _ in range(n)]
+        up._infer_batch(tiles)
+        t = time.perf_counter()
+        for _ in range(args.runs): up._infer_batch(tiles)
+        sec = (time.perf_counter() - t) / args.runs
+        print(f"batch {n}: {sec * 1000:8.1f} ms/batch | {n / sec:7.2f} tiles/s")
+
+
+if __name__ == "__main__":
+    import argparse
+    parser = argparse.ArgumentParser(description="SmartCropper AI upscaler tools")
+    parser.add_argument("--model", default="4x-UltraSharp.onnx")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("check-tiles", help="compare tiled vs. whole-image inference")
+    p.add_argument("image")
+    p.add_argument("--tile", type=int, default=config.AI_TILE_SIZE)
+    p.add_argument("--overlap", type=int, default=config.AI_TILE_OVERLAP)
+    p.set_defaults(func=_check_tiles)
+    p = sub.add_parser("autotune", help="find the fastest onnxruntime thread settings for this machine")
+    p.add_argument("--size", type=int, default=128, help="input tile size used for timing")
+    p.add_argument("--runs", type=int, default=5)
+    p.set_defaults(func=_autotune)
+    p = sub.add_parser("bench", help="latency and peak memory of one upscale")
+    p.add_argument("image")
+    p.add_argument("--tile", type=int, default=config.AI_TILE_SIZE)
+    p.add_argument("--runs", type=int, default=5)
+    p.set_defaults(func=_bench)
+    p = sub.add_parser("bench-batch", help="tile throughput at batch sizes 1/2/4/8")
+    p.add_argument("--size", type=int, default=config.AI_TILE_SIZE, help="tile size")
+    p.add_argument("--runs", type=int, default=5)
+    p.set_defaults(func=_bench_batch)
+    args = parser.parse_args()
+    args.func(args)